@@ -1,13 +1,111 @@
+from typing import Dict, Iterable, List, Optional
 import streamlit as st
-import folium
-from streamlit_folium import folium_static
-import pandas as pd
 from astar import pathfinder
-from graph_data import CUENCA_NODES
+from graph_data import WALKING_MINUTES_PER_KM
+from instrumentation import Profiler
+from route_cache import CachedPathFinder
+from tour import TourPlanner
 
 # Configuración de la página
 st.set_page_config(page_title="Búsqueda de Rutas Óptimas en Cuenca", page_icon="🗺️", layout="wide")
 
+# Caché de rutas compartida por todas las sesiones
+@st.cache_resource
+def get_router() -> CachedPathFinder:
+    return CachedPathFinder(pathfinder)
+
+router = get_router()
+
+# Perfilador de las consultas de todas las sesiones (panel de rendimiento)
+@st.cache_resource
+def get_profiler() -> Profiler:
+    profiler = Profiler()
+    pathfinder.profiler = profiler
+    return profiler
+
+profiler = get_profiler()
+# Nodos del grafo cargado (por defecto, el conjunto de Cuenca de graph_data.py)
+NODES = pathfinder.nodes
+
+# ============= MAPA Y TABLAS =============
+# folium, streamlit_folium y pandas se importan al dibujar el primer mapa o tabla,
+# no al arrancar la aplicación
+
+def points_layer(nodes: Iterable[str], labels: Optional[Dict[str, str]] = None,
+                 colors: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    FeatureCollection GeoJSON con un punto por nodo.
+
+    Args:
+        nodes: Nombres de los nodos
+        labels: Texto del tooltip de cada nodo (por defecto, nombre y tiempo de visita)
+        colors: Color de cada nodo, para ``style_function``
+    """
+    features = []
+    for name in nodes:
+        data = NODES[name]
+        tiempo = data.get('tiempo', 0)
+        properties = {
+            "name": name,
+            "descripcion": data["descripcion"],
+            "tiempo": tiempo,
+            "label": labels[name] if labels is not None else f"{name} ({tiempo} min)",
+        }
+        if colors is not None:
+            properties["color"] = colors[name]
+        features.append({
+            "type": "Feature",
+            "id": name,
+            "geometry": {"type": "Point", "coordinates": [data["lon"], data["lat"]]},
+            "properties": properties,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+# Capa base con todos los puntos de interés, compartida por todas las sesiones
+@st.cache_resource
+def get_poi_layer() -> Dict:
+    return points_layer(NODES)
+
+
+def base_map(center: List[float], zoom: int):
+    """Mapa con la capa base de puntos de interés; cada consulta solo añade su superposición."""
+    import folium
+    m = folium.Map(location=center, zoom_start=zoom)
+    folium.GeoJson(
+        get_poi_layer(), name="Puntos de interés",
+        marker=folium.CircleMarker(radius=6, color="#1e88e5", weight=2, fill=True,
+                                   fill_color="white", fill_opacity=0.9),
+        tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
+        popup=folium.GeoJsonPopup(fields=["name", "descripcion", "tiempo"],
+                                  aliases=["Lugar", "Descripción", "Tiempo (min)"]),
+    ).add_to(m)
+    return m
+
+
+def add_steps(m, nodes: List[str], labels: Dict[str, str]) -> None:
+    """Paradas numeradas de una ruta o tour, como una sola capa GeoJSON."""
+    import folium
+    folium.GeoJson(
+        points_layer(dict.fromkeys(nodes), labels), name="Paradas",
+        marker=folium.CircleMarker(radius=9, color="#1e88e5", weight=3, fill=True,
+                                   fill_color="white", fill_opacity=1.0),
+        tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
+    ).add_to(m)
+
+
+def show_map(m) -> None:
+    from streamlit_folium import folium_static
+    folium_static(m, width=1000, height=600)
+
+
+def show_table(rows: List[Dict]):
+    """Muestra ``rows`` como tabla y devuelve el DataFrame."""
+    import pandas as pd
+    df = pd.DataFrame(rows)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    return df
+
 # CSS personalizado
 st.markdown("""
 <style>
@@ -80,30 +178,86 @@ col_sidebar, col_main = st.columns([1, 3])
 with col_sidebar:
     st.markdown("### ⚙️ Configuración de Búsqueda")
     
-    st.markdown("**Selecciona el punto de INICIO**")
-    start = st.selectbox("", sorted(CUENCA_NODES.keys()), key="start", label_visibility="collapsed")
+    st.markdown("**Herramienta**")
+    tool = st.radio("", ["Ruta", "Tour", "Alcance"], key="tool", horizontal=True, label_visibility="collapsed")
+    
+    if tool == "Ruta":
+        st.markdown("**Selecciona el punto de INICIO**")
+        use_coords = st.checkbox("Usar coordenadas (GPS)", value=False, key="use_coords")
+        if use_coords:
+            # El punto se ajusta al nodo más cercano mediante el índice espacial
+            lat_col, lon_col = st.columns(2)
+            start_lat = lat_col.number_input("Latitud", value=-2.8970, format="%.5f", key="start_lat")
+            start_lon = lon_col.number_input("Longitud", value=-79.0050, format="%.5f", key="start_lon")
+            start, snap_km = pathfinder.nearest_nodes(start_lat, start_lon)[0]
+            st.caption(f"📍 Nodo más cercano: {start} ({snap_km * 1000:.0f} m)")
+        else:
+            start = st.selectbox("", sorted(NODES.keys()), key="start", label_visibility="collapsed")
+    
+        st.markdown("**Selecciona el punto de DESTINO**")
+        goal = st.selectbox("", sorted(NODES.keys()), index=5, key="goal", label_visibility="collapsed")
+    
+        st.markdown("**Modo de búsqueda**")
+        search_modes = {"A* unidireccional": "unidirectional", "A* bidireccional": "bidirectional",
+                        "Contraction Hierarchies": "ch"}
+        search_mode = search_modes[st.radio("", list(search_modes), key="mode", label_visibility="collapsed")]
     
-    st.markdown("**Selecciona el punto de DESTINO**")
-    goal = st.selectbox("", sorted(CUENCA_NODES.keys()), index=5, key="goal", label_visibility="collapsed")
+        st.markdown("**Heurística**")
+        heuristics = {"Distancia Euclidiana": "euclidean", "Distancia Haversine": "haversine", "ALT (landmarks)": "alt"}
+        heuristic_label = st.selectbox("", list(heuristics), key="heuristic", label_visibility="collapsed")
     
-    show_all = st.checkbox("Mostrar todos los nodos visitados en el mapa", value=False)
+        show_all = st.checkbox("Mostrar todos los nodos visitados en el mapa", value=False)
+        alternatives_count = st.number_input("Rutas alternativas", min_value=0, max_value=3, value=0, key="alternatives")
     
-    calc_button = st.button("🔍 Buscar Ruta Óptima", type="primary")
+        calc_button = st.button("🔍 Buscar Ruta Óptima", type="primary")
+    elif tool == "Tour":
+        st.markdown("**Puntos a visitar**")
+        tour_pois = st.multiselect("", sorted(NODES.keys()), default=sorted(NODES.keys())[:5],
+                                   key="tour_pois", label_visibility="collapsed")
+        
+        st.markdown("**Inicio y final**")
+        free_label = "(libre)"
+        tour_start = st.selectbox("Inicio", [free_label] + sorted(NODES.keys()), key="tour_start")
+        round_trip = st.checkbox("Volver al punto de inicio", value=False, key="tour_round")
+        if round_trip:
+            tour_end = tour_start
+        else:
+            tour_end = st.selectbox("Final", [free_label] + sorted(NODES.keys()), key="tour_end")
+        
+        tour_budget = st.number_input("Tiempo disponible (min, 0 = sin límite)", min_value=0, value=0,
+                                      step=15, key="tour_budget")
+        heuristic_label = "No aplica (matriz de distancias)"
+        
+        calc_button = st.button("🧭 Planificar Tour", type="primary")
+    else:
+        st.markdown("**Punto de partida**")
+        reach_source = st.selectbox("", sorted(NODES.keys()), key="reach_source", label_visibility="collapsed")
+        
+        st.markdown("**Minutos caminando**")
+        reach_minutes = st.slider("", min_value=5, max_value=120, value=20, step=5, key="reach_minutes",
+                                  label_visibility="collapsed")
+        heuristic_label = "No aplica (Dijkstra acotado)"
+        
+        calc_button = st.button("⏱️ Calcular Alcance", type="primary")
     
     if st.button("🗑️ Limpiar"):
         st.rerun()
     
+    cache_stats = router.stats()
+    st.caption(f"🗃️ Caché de rutas: {cache_stats.hits + cache_stats.tree_hits} aciertos · "
+               f"{cache_stats.misses} fallos · {cache_stats.evictions} desalojos")
+    
     st.markdown("---")
     
     st.markdown("### ℹ️ Información")
-    st.markdown("""
+    st.markdown(f"""
     **Asignatura:** Inteligencia Artificial  
     **Tema:** Algoritmos de Búsqueda en Python  
     **Aplicación:** Búsqueda de Rutas Óptimas en Cuenca
     
     **Total de Nodos:** 15 puntos de interés  
     **Algoritmo:** A* (A-Star)  
-    **Heurística:** Distancia Euclidiana
+    **Heurística:** {heuristic_label}
     
     Desarrollado como parte de la práctica académica sobre algoritmos de búsqueda informada.
     """)
@@ -112,23 +266,132 @@ with col_sidebar:
     
     st.markdown("### 📚 Guía Práctica")
     with st.expander("Ver todos los puntos de interés"):
-        for node in sorted(CUENCA_NODES.keys()):
-            tiempo = CUENCA_NODES[node].get('tiempo', 0)
+        for node in sorted(NODES.keys()):
+            tiempo = NODES[node].get('tiempo', 0)
             st.text(f"• {node} ({tiempo} min)")
 
 # ============= CONTENIDO PRINCIPAL =============
 with col_main:
-    if calc_button:
+    if tool == "Tour" and calc_button:
+        planner = TourPlanner(pathfinder)
+        tour = planner.plan(tour_pois,
+                            start=None if tour_start == free_label else tour_start,
+                            end=None if tour_end == free_label else tour_end,
+                            time_budget=tour_budget or None)
+        
+        if not tour.stops:
+            st.warning("⚠️ Selecciona al menos un punto a visitar o un punto de inicio.")
+        elif not tour.found:
+            st.error("❌ No se encontró un recorrido que conecte los puntos seleccionados.")
+        elif not tour.within_budget:
+            st.error(f"⏳ Ni siquiera el trayecto {' → '.join(tour.stops)} cabe en {tour_budget} min "
+                     f"(hacen falta {tour.total_minutes:.0f} min).")
+        else:
+            method = "óptimo (Held–Karp)" if tour.exact else "aproximado (2-opt / Or-opt)"
+            st.markdown(f"""
+            <div class="success-box">
+                ✅ <strong>¡Tour planificado!</strong> &nbsp;&nbsp; 🧭 {len(tour.stops)} paradas · orden {method}
+            </div>
+            """, unsafe_allow_html=True)
+            
+            metric_col1, metric_col2, metric_col3 = st.columns(3)
+            with metric_col1:
+                st.metric("📏 Distancia a pie", f"{tour.distance:.2f} km")
+            with metric_col2:
+                st.metric("🚶 Tiempo caminando", f"{tour.walking_minutes:.0f} min")
+            with metric_col3:
+                st.metric("⏱️ Tiempo total (visitas + recorrido)", f"{tour.total_minutes:.0f} min")
+            
+            if tour.skipped:
+                st.warning(f"⏳ No caben en {tour_budget} min: {', '.join(tour.skipped)}")
+            
+            st.markdown(f"""
+            <div class="route-path">
+                <strong>🧭 Orden de visita:</strong> {" → ".join(tour.stops)}
+            </div>
+            """, unsafe_allow_html=True)
+            
+            st.markdown('<div class="section-header">📋 Paradas del Tour</div>', unsafe_allow_html=True)
+            accumulated = 0.0
+            tour_data = []
+            for i, node in enumerate(tour.stops):
+                leg = tour.legs[i - 1] if i > 0 else 0.0
+                accumulated += leg
+                tour_data.append({
+                    'Parada': i + 1,
+                    'Lugar': node,
+                    'Tiempo Visita (min)': NODES[node].get('tiempo', 0),
+                    'Tramo (km)': f"{leg:.3f}" if i > 0 else "-",
+                    'Distancia Acumulada (km)': f"{accumulated:.3f}"
+                })
+            show_table(tour_data)
+            
+            st.markdown('<div class="section-header">🗺️ Visualización del Tour en Mapa</div>', unsafe_allow_html=True)
+            center_lat = sum(NODES[n]["lat"] for n in tour.path) / len(tour.path)
+            center_lon = sum(NODES[n]["lon"] for n in tour.path) / len(tour.path)
+            import folium
+            m = base_map([center_lat, center_lon], 14)
+            folium.PolyLine([[NODES[n]["lat"], NODES[n]["lon"]] for n in tour.path], color="#1e88e5",
+                            weight=6, opacity=0.8, popup=f"Tour: {tour.distance:.2f} km").add_to(m)
+            # Un nodo puede repetirse (tour de ida y vuelta): su etiqueta reúne sus números
+            stop_numbers: Dict[str, List[str]] = {}
+            for i, node in enumerate(tour.stops, 1):
+                stop_numbers.setdefault(node, []).append(str(i))
+            add_steps(m, list(tour.stops), {node: f"{', '.join(numbers)}. {node} ({NODES[node].get('tiempo', 0)} min)"
+                                            for node, numbers in stop_numbers.items()})
+            show_map(m)
+    
+    elif tool == "Alcance" and calc_button:
+        reach = pathfinder.reachable(reach_source, reach_minutes)
+        
+        st.markdown(f"""
+        <div class="success-box">
+            ✅ <strong>{len(reach)} lugares</strong> a {reach_minutes} minutos caminando o menos desde <strong>{reach_source}</strong>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown('<div class="section-header">🗺️ Zona Alcanzable</div>', unsafe_allow_html=True)
+        source_data = NODES[reach_source]
+        import folium
+        m = base_map([source_data["lat"], source_data["lon"]], 15)
+        # Aristas entre nodos alcanzables (el subgrafo que se recorre en el tiempo dado),
+        # todas en una sola polilínea de varios tramos
+        segments = [[[NODES[node]["lat"], NODES[node]["lon"]], [NODES[neighbor]["lat"], NODES[neighbor]["lon"]]]
+                    for node in reach for neighbor in pathfinder.edges.get(node, ()) if neighbor in reach]
+        if segments:
+            folium.PolyLine(segments, color="#1e88e5", weight=3, opacity=0.5).add_to(m)
+        # Color de verde (cerca) a rojo (en el límite) según el minuto de llegada
+        colors = {}
+        for node, minutes in reach.items():
+            share = minutes / reach_minutes
+            colors[node] = f"#{int(255 * share):02x}{int(180 * (1 - share)):02x}40"
+        folium.GeoJson(
+            points_layer(reach, {node: f"{node}: {minutes:.1f} min" for node, minutes in reach.items()}, colors),
+            name="Alcance",
+            marker=folium.CircleMarker(radius=9, fill=True, fill_opacity=0.8),
+            style_function=lambda feature: {"color": feature["properties"]["color"],
+                                            "fillColor": feature["properties"]["color"]},
+            tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
+        ).add_to(m)
+        folium.Marker([source_data["lat"], source_data["lon"]], tooltip=f"Partida: {reach_source}",
+                      icon=folium.Icon(color="green", icon="play", prefix='glyphicon')).add_to(m)
+        show_map(m)
+        
+        show_table([{'Lugar': node, 'Minutos caminando': f"{minutes:.1f}",
+                     'Tiempo Visita (min)': NODES[node].get('tiempo', 0)} for node, minutes in reach.items()])
+    
+    elif calc_button:
         if start == goal:
             st.warning("⚠️ El punto de inicio y destino son el mismo. Por favor selecciona ubicaciones diferentes.")
         else:
-            path, distance, visited_nodes = pathfinder.find_path(start, goal)
+            result = router.find_path(start, goal, mode=search_mode, heuristic=heuristics[heuristic_label])
+            path, distance, visited_nodes = result.path, result.cost, result.visited_nodes
             
             if path is None:
                 st.error("❌ No se encontró una ruta entre los puntos seleccionados.")
             else:
                 # Calcular tiempo total de visita
-                tiempo_total = sum(CUENCA_NODES[node].get('tiempo', 0) for node in path)
+                tiempo_total = sum(NODES[node].get('tiempo', 0) for node in path)
                 
                 # Mensaje de éxito
                 st.markdown(f"""
@@ -137,8 +400,14 @@ with col_main:
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Métricas en 3 columnas
-                metric_col1, metric_col2, metric_col3 = st.columns(3)
+                # Métricas en 4 columnas
+                metric_col1, metric_col2, metric_perf, metric_col3 = st.columns(4)
+                profile = result.profile
+                # Las respuestas de la caché de árboles o de la tabla de distancias no
+                # vienen de una búsqueda con el modo y la heurística elegidos
+                origin_notes = {"tree": "🌳 Árbol de caminos mínimos en caché (Dijkstra)",
+                                "table": "📋 Tabla de distancias precalculada"}
+                origin_note = origin_notes.get(result.origin)
                 
                 with metric_col1:
                     st.markdown(f"""
@@ -153,9 +422,29 @@ with col_main:
                     <div class="metric-box">
                         <h4 style="margin: 0; color: #666;">🔢 Nodos Explorados</h4>
                         <h2 style="margin: 10px 0; color: #1e88e5;">{visited_nodes}</h2>
+                        <small style="color: #666;">{origin_note or f"→ {result.stats.expanded_forward} adelante · ← {result.stats.expanded_backward} atrás"}</small>
                     </div>
                     """, unsafe_allow_html=True)
                 
+                with metric_perf:
+                    if profile is not None:
+                        branching = f"{profile.branching_factor:.2f}" if profile.depth else "-"
+                        st.markdown(f"""
+                        <div class="metric-box">
+                            <h4 style="margin: 0; color: #666;">⚡ Rendimiento</h4>
+                            <h2 style="margin: 10px 0; color: #1e88e5;">{profile.seconds * 1000:.2f} ms</h2>
+                            <small style="color: #666;">b* {branching} · {profile.heap_pops} extracciones</small>
+                        </div>
+                        """, unsafe_allow_html=True)
+                    elif origin_note is not None:
+                        st.markdown(f"""
+                        <div class="metric-box">
+                            <h4 style="margin: 0; color: #666;">⚡ Rendimiento</h4>
+                            <h2 style="margin: 10px 0; color: #1e88e5;">Sin búsqueda</h2>
+                            <small style="color: #666;">{origin_note}</small>
+                        </div>
+                        """, unsafe_allow_html=True)
+                
                 with metric_col3:
                     st.markdown(f"""
                     <div class="metric-box">
@@ -172,21 +461,62 @@ with col_main:
                 </div>
                 """, unsafe_allow_html=True)
                 
+                # Panel de rendimiento: la consulta actual y los agregados de todas las sesiones
+                if profile is not None:
+                    with st.expander("📈 Panel de rendimiento"):
+                        st.caption("Si la ruta vino de la caché, el perfil es el de la consulta que la calculó.")
+                        perf_col1, perf_col2 = st.columns(2)
+                        with perf_col1:
+                            st.markdown("**Esta consulta**")
+                            show_table([
+                                {'Medida': 'Inserciones en la cola', 'Valor': profile.heap_pushes},
+                                {'Medida': 'Extracciones de la cola', 'Valor': profile.heap_pops},
+                                {'Medida': 'Entradas obsoletas evitadas', 'Valor': profile.heap_stale},
+                                {'Medida': 'Llamadas a la heurística', 'Valor': profile.heuristic_calls},
+                                {'Medida': 'Cálculos de distancia', 'Valor': profile.distance_calls},
+                            ] + [{'Medida': f'Fase {phase} (ms)', 'Valor': round(seconds * 1000, 3)}
+                                 for phase, seconds in profile.phases.items()])
+                        with perf_col2:
+                            summary = profiler.summary()
+                            st.markdown(f"**Todas las consultas ({summary['queries']})**")
+                            show_table([
+                                {'Medida': 'Latencia media (ms)', 'Valor': round(summary['latency_mean_ms'], 3)},
+                                {'Medida': 'Latencia p50 (ms, ≤)', 'Valor': summary['latency_p50_ms']},
+                                {'Medida': 'Latencia p99 (ms, ≤)', 'Valor': summary['latency_p99_ms']},
+                                {'Medida': 'b* medio', 'Valor': round(summary['branching_factor_mean'], 3)},
+                            ] + [{'Medida': f'{name} por consulta', 'Valor': round(value, 1)}
+                                 for name, value in summary['per_query'].items()])
+                        export_col1, export_col2 = st.columns(2)
+                        with export_col1:
+                            st.download_button("📥 Métricas (Prometheus)", profiler.to_prometheus(),
+                                               "astar_metrics.prom", "text/plain")
+                        with export_col2:
+                            st.download_button("📥 Métricas (JSON)", profiler.to_json(),
+                                               "astar_metrics.json", "application/json")
+                
+                # Rutas alternativas (Yen), distintas en al menos un 30 % de su longitud
+                alternatives = []
+                if alternatives_count:
+                    alternatives = [alt for alt in pathfinder.find_k_paths(start, goal, alternatives_count + 1, max_overlap=0.7)
+                                    if alt.path != path][:alternatives_count]
+                    if alternatives:
+                        alt_lines = "<br>".join(f"<strong>Alternativa {i}:</strong> {' → '.join(alt.path)} ({alt.cost:.2f} km, +{alt.cost - distance:.2f})"
+                                                for i, alt in enumerate(alternatives, 1))
+                        st.markdown(f'<div class="info-box">🔀 {alt_lines}</div>', unsafe_allow_html=True)
+                    else:
+                        st.info("🔀 No hay rutas alternativas suficientemente distintas.")
+                
                 # Detalles de la ruta
                 st.markdown('<div class="section-header">📋 Detalles de la Ruta</div>', unsafe_allow_html=True)
                 
+                # Tramos de la propia consulta (no de los pesos actuales), acumulados en una pasada
+                legs = result.legs
                 route_data = []
-                for i in range(len(path)):
-                    node = path[i]
-                    info = CUENCA_NODES[node]
-                    
-                    if i < len(path) - 1:
-                        next_node = path[i + 1]
-                        segment_dist = pathfinder.get_distance(node, next_node)
-                        accumulated = sum(pathfinder.get_distance(path[j], path[j+1]) for j in range(i+1))
-                    else:
-                        segment_dist = 0
-                        accumulated = distance
+                accumulated = 0.0
+                for i, node in enumerate(path):
+                    info = NODES[node]
+                    segment_dist = legs[i] if i < len(legs) else 0
+                    accumulated += segment_dist
                     
                     route_data.append({
                         'Paso': i + 1,
@@ -199,15 +529,14 @@ with col_main:
                         'Distancia Acumulada (km)': f"{accumulated:.3f}"
                     })
                 
-                df = pd.DataFrame(route_data)
-                st.dataframe(df, use_container_width=True, hide_index=True)
+                df = show_table(route_data)
                 
                 # Información adicional de tiempo
                 col_info1, col_info2 = st.columns(2)
                 with col_info1:
-                    st.info(f"🚶 **Tiempo de recorrido estimado:** ~{int(distance * 12)} minutos caminando")
+                    st.info(f"🚶 **Tiempo de recorrido estimado:** ~{int(distance * WALKING_MINUTES_PER_KM)} minutos caminando")
                 with col_info2:
-                    st.info(f"⏱️ **Tiempo total (visitas + recorrido):** ~{tiempo_total + int(distance * 12)} minutos")
+                    st.info(f"⏱️ **Tiempo total (visitas + recorrido):** ~{tiempo_total + int(distance * WALKING_MINUTES_PER_KM)} minutos")
                 
                 # Botón descargar
                 csv = df.to_csv(index=False).encode('utf-8')
@@ -216,54 +545,49 @@ with col_main:
                 # Mapa
                 st.markdown('<div class="section-header">🗺️ Visualización de la Ruta en Mapa</div>', unsafe_allow_html=True)
                 
-                center_lat = sum(CUENCA_NODES[n]["lat"] for n in path) / len(path)
-                center_lon = sum(CUENCA_NODES[n]["lon"] for n in path) / len(path)
+                center_lat = sum(NODES[n]["lat"] for n in path) / len(path)
+                center_lon = sum(NODES[n]["lon"] for n in path) / len(path)
                 
-                m = folium.Map(location=[center_lat, center_lon], zoom_start=14)
+                import folium
+                m = base_map([center_lat, center_lon], 14)
                 
-                # Marcadores
-                for node_name, node_data in CUENCA_NODES.items():
-                    tiempo = node_data.get('tiempo', 0)
-                    
-                    if node_name == start:
-                        color, icon = "green", "play"
-                        popup = f"<b>🟢 INICIO</b><br>{node_name}<br>{node_data['descripcion']}<br>⏱️ Tiempo: {tiempo} min"
-                    elif node_name == goal:
-                        color, icon = "red", "stop"
-                        popup = f"<b>🔴 DESTINO</b><br>{node_name}<br>{node_data['descripcion']}<br>⏱️ Tiempo: {tiempo} min"
-                    elif node_name in path:
-                        color, icon = "blue", "info-sign"
-                        popup = f"<b>🔵 EN RUTA</b><br>{node_name}<br>{node_data['descripcion']}<br>⏱️ Tiempo: {tiempo} min"
-                    elif show_all and node_name in pathfinder.explored:
-                        color, icon = "lightgray", "record"
-                        popup = f"<b>Nodo Explorado</b><br>{node_name}<br>⏱️ Tiempo: {tiempo} min"
-                    else:
-                        continue
-                    
-                    folium.Marker(
-                        [node_data["lat"], node_data["lon"]],
-                        popup=folium.Popup(popup, max_width=300),
-                        tooltip=f"{node_name} ({tiempo} min)",
-                        icon=folium.Icon(color=color, icon=icon, prefix='glyphicon')
+                # Nodos explorados fuera de la ruta, en una sola capa
+                if show_all:
+                    explored = [n for n in result.explored if n not in path]
+                    folium.GeoJson(
+                        points_layer(explored, {n: f"Nodo explorado: {n}" for n in explored}),
+                        name="Explorados",
+                        marker=folium.CircleMarker(radius=5, color="#9e9e9e", fill=True,
+                                                   fill_color="#bdbdbd", fill_opacity=0.8),
+                        tooltip=folium.GeoJsonTooltip(fields=["label"], labels=False),
                     ).add_to(m)
                 
+                # Alternativas debajo de la ruta óptima, cada una con su color
+                alternative_colors = ["#e53935", "#8e24aa", "#fb8c00"]
+                for i, alt in enumerate(alternatives):
+                    folium.PolyLine([[NODES[n]["lat"], NODES[n]["lon"]] for n in alt.path],
+                                    color=alternative_colors[i % len(alternative_colors)], weight=4, opacity=0.7,
+                                    dash_array="8", popup=f"Alternativa {i + 1}: {alt.cost:.2f} km").add_to(m)
+                
                 # Línea de ruta
-                coords = [[CUENCA_NODES[n]["lat"], CUENCA_NODES[n]["lon"]] for n in path]
+                coords = [[NODES[n]["lat"], NODES[n]["lon"]] for n in path]
                 folium.PolyLine(coords, color="#1e88e5", weight=6, opacity=0.8, 
                                popup=f"Ruta Óptima: {distance:.2f} km").add_to(m)
                 
-                # Números en los puntos
-                for i, node in enumerate(path, 1):
+                # Números de paso en los puntos e inicio y destino
+                add_steps(m, list(path), {node: f"{i}. {node} ({NODES[node].get('tiempo', 0)} min)"
+                                          for i, node in enumerate(path, 1)})
+                for node, color, icon, label in ((start, "green", "play", "🟢 INICIO"),
+                                                 (goal, "red", "stop", "🔴 DESTINO")):
                     folium.Marker(
-                        [CUENCA_NODES[node]["lat"], CUENCA_NODES[node]["lon"]],
-                        icon=folium.DivIcon(html=f'''
-                            <div style="background: white; border: 2px solid #1e88e5; border-radius: 50%; 
-                            width: 28px; height: 28px; display: flex; align-items: center; 
-                            justify-content: center; font-weight: bold; font-size: 13px; color: #1e88e5;">{i}</div>
-                        ''')
+                        [NODES[node]["lat"], NODES[node]["lon"]],
+                        popup=folium.Popup(f"<b>{label}</b><br>{node}<br>{NODES[node]['descripcion']}<br>"
+                                           f"⏱️ Tiempo: {NODES[node].get('tiempo', 0)} min", max_width=300),
+                        tooltip=f"{node} ({NODES[node].get('tiempo', 0)} min)",
+                        icon=folium.Icon(color=color, icon=icon, prefix='glyphicon')
                     ).add_to(m)
                 
-                folium_static(m, width=1000, height=600)
+                show_map(m)
                 
                 # Resumen final
                 st.markdown("---")
@@ -283,28 +607,17 @@ with col_main:
         
         st.markdown('<div class="section-header">🗺️ Mapa de Cuenca - Puntos de Interés Turístico</div>', unsafe_allow_html=True)
         
-        center_lat = sum(n["lat"] for n in CUENCA_NODES.values()) / len(CUENCA_NODES)
-        center_lon = sum(n["lon"] for n in CUENCA_NODES.values()) / len(CUENCA_NODES)
-        
-        m = folium.Map(location=[center_lat, center_lon], zoom_start=13)
-        
-        for node_name, node_data in CUENCA_NODES.items():
-            tiempo = node_data.get('tiempo', 0)
-            folium.Marker(
-                [node_data["lat"], node_data["lon"]],
-                popup=f"<b>{node_name}</b><br>{node_data['descripcion']}<br>⏱️ Tiempo estimado: {tiempo} min",
-                tooltip=f"{node_name} ({tiempo} min)",
-                icon=folium.Icon(color="blue", icon="info-sign")
-            ).add_to(m)
+        center_lat = sum(n["lat"] for n in NODES.values()) / len(NODES)
+        center_lon = sum(n["lon"] for n in NODES.values()) / len(NODES)
         
-        folium_static(m, width=1000, height=600)
+        show_map(base_map([center_lat, center_lon], 13))
         
         # Tabla de todos los puntos
         st.markdown('<div class="section-header">📍 Todos los Puntos de Interés</div>', unsafe_allow_html=True)
         
         all_points = []
-        for node_name in sorted(CUENCA_NODES.keys()):
-            node_data = CUENCA_NODES[node_name]
+        for node_name in sorted(NODES.keys()):
+            node_data = NODES[node_name]
             all_points.append({
                 'Lugar': node_name,
                 'Descripción': node_data['descripcion'],
@@ -313,5 +626,4 @@ with col_main:
                 'Longitud': f"{node_data['lon']:.5f}"
             })
         
-        df_all = pd.DataFrame(all_points)
-        st.dataframe(df_all, use_container_width=True, hide_index=True)
\ No newline at end of file
+        show_table(all_points)
\ No newline at end of file
@@ -0,0 +1,128 @@
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Dict, List, Mapping, Sequence, Tuple, Union
+
+# Formato: MAGIC | longitud del encabezado (uint32 little endian) | encabezado JSON |
+# relleno hasta múltiplo de 8 | arreglos crudos, cada uno alineado a 8 bytes.
+# El encabezado describe cada arreglo (nombre, typecode, longitud y desplazamiento
+# relativo al inicio de los datos), por lo que los arreglos se pueden mapear en
+# memoria directamente (mmap, np.memmap) sin copiarlos.
+MAGIC = b"CUENCAAR"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+ArrayLike = Union[array, memoryview]
+
+
+def _align(n: int) -> int:
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(path: str, meta: Mapping, arrays: Mapping[str, ArrayLike]) -> None:
+    """
+    Guarda un conjunto de arreglos con metadatos en un único archivo binario.
+
+    La escritura es atómica: se escribe a un archivo temporal y luego se renombra.
+
+    Args:
+        path: Ruta del archivo de salida
+        meta: Metadatos serializables en JSON
+        arrays: Diccionario nombre -> arreglo (``array.array`` o ``memoryview``)
+    """
+    entries: List[Dict] = []
+    offset = 0
+    for name, data in arrays.items():
+        view = memoryview(data)
+        entries.append({"name": name, "typecode": view.format, "length": len(view), "offset": offset})
+        offset = _align(offset + view.nbytes)
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "meta": dict(meta),
+        "arrays": entries,
+    }, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(MAGIC) + 4 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        for entry, data in zip(entries, arrays.values()):
+            f.write(b"\0" * (data_start + entry["offset"] - f.tell()))
+            f.write(memoryview(data).cast("B"))
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str) -> Tuple[Dict, List[Dict]]:
+    """
+    Lee solo el encabezado de un archivo.
+
+    Returns:
+        (metadatos, descripción de cada arreglo con su desplazamiento absoluto en bytes)
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} no es un archivo de arreglos válido")
+        header_len = int.from_bytes(f.read(4), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header["format_version"] != FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada en {path}: {header['format_version']}")
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} fue escrito con otro orden de bytes ({header['byteorder']})")
+    data_start = _align(len(MAGIC) + 4 + header_len)
+    entries = [dict(entry, offset=data_start + entry["offset"]) for entry in header["arrays"]]
+    return header["meta"], entries
+
+
+def read_arrays(path: str, use_mmap: bool = False) -> Tuple[Dict, Dict[str, ArrayLike]]:
+    """
+    Carga los arreglos de un archivo escrito con ``write_arrays``.
+
+    Args:
+        path: Ruta del archivo
+        use_mmap: Si es True, los arreglos son vistas de solo lectura sobre el archivo
+            mapeado en memoria (carga inmediata, páginas compartidas entre procesos);
+            si es False, se copian a ``array.array`` modificables.
+
+    Returns:
+        (metadatos, diccionario nombre -> arreglo)
+    """
+    meta, entries = read_header(path)
+    arrays: Dict[str, ArrayLike] = {}
+    if use_mmap:
+        with open(path, "rb") as f:
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        for entry in entries:
+            itemsize = array(entry["typecode"]).itemsize
+            start = entry["offset"]
+            arrays[entry["name"]] = buffer[start:start + entry["length"] * itemsize].cast(entry["typecode"])
+    else:
+        with open(path, "rb") as f:
+            for entry in entries:
+                data = array(entry["typecode"])
+                f.seek(entry["offset"])
+                data.frombytes(f.read(entry["length"] * data.itemsize))
+                arrays[entry["name"]] = data
+    return meta, arrays
+
+
+
+def pack_strings(strings: Sequence[str]) -> Tuple[array, array]:
+    """Codifica una lista de cadenas como (bytes UTF-8 concatenados, desplazamientos)."""
+    blob = bytearray()
+    offsets = array("q", [0])
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    return array("B", bytes(blob)), offsets
+
+
+def unpack_strings(blob: ArrayLike, offsets: ArrayLike) -> List[str]:
+    """Inverso de ``pack_strings``."""
+    raw = bytes(blob)
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
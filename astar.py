@@ -1,13 +1,71 @@
 import heapq
-from typing import Dict, List, Tuple, Optional
-from graph_data import CUENCA_NODES, GRAPH_EDGES, haversine_distance, euclidean_distance
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Mapping, Sequence, Tuple, Optional, Union
+import numpy as np
+from graph_data import WALKING_MINUTES_PER_KM, haversine_distance, euclidean_distance
+from compiled_graph import CompiledGraph, EdgeTable, NodeTable
+from graph_loader import SNAPSHOT_PATH, load_graph, load_snapshot
+from search_workspace import SearchWorkspace
+from spatial_index import SpatialIndex
+from distance_table import TABLE_PATH, DistanceTable
+from contraction import CH_PATH, ContractionHierarchy, load_or_build as load_or_build_hierarchy
+from instrumentation import Profiler
+from landmarks import LANDMARKS_PATH, LandmarkTable, load_or_build as load_or_build_landmarks
+from results import RouteResult, make_result
+
+# Heurísticas disponibles: distancia euclidiana aproximada (grados × 111 km),
+# distancia Haversine en línea recta y ALT (landmarks + desigualdad triangular)
+HEURISTICS = ("euclidean", "haversine", "alt")
+# Modos de búsqueda: A* unidireccional, A* bidireccional y consulta sobre
+# Contraction Hierarchies (ignora la heurística)
+SEARCH_MODES = ("unidirectional", "bidirectional", "ch")
+# Ejecutores disponibles para las consultas en lote
+EXECUTORS = ("thread", "process")
+# Un extremo de ruta: nombre de nodo o coordenadas (lat, lon) que se ajustan al
+# nodo más cercano
+Location = Union[str, Tuple[float, float]]
+INF = float("inf")
 
 class AStarPathFinder:
-    def __init__(self, nodes: Dict, edges: Dict):
+    def __init__(self, nodes: Mapping, edges: Mapping, landmarks_path: Optional[str] = None,
+                 ch_path: Optional[str] = None, table_path: Optional[str] = None,
+                 graph: Optional[CompiledGraph] = None, profiler: Optional[Profiler] = None):
         self.nodes = nodes
         self.edges = edges
-        self.explored: List[str] = []
-        self.frontier: List[Tuple[float, int, str, List[str], float]] = []
+        self.graph = graph if graph is not None else CompiledGraph(nodes, edges)
+        self.landmarks_path = landmarks_path
+        self.landmarks: Optional[LandmarkTable] = None
+        self.ch_path = ch_path
+        self.hierarchy: Optional[ContractionHierarchy] = None
+        self.table_path = table_path
+        self.distance_table: Optional[DistanceTable] = None
+        self._table_checked = False
+        self.spatial: Optional[SpatialIndex] = None
+        # Instrumentación opcional; con None las consultas no miden nada
+        self.profiler = profiler
+        # Los candados solo protegen la carga perezosa de landmarks, jerarquía, índice espacial y
+        # tabla de distancias (uno por estructura, para que una carga lenta no bloquee las consultas
+        # que usan otra); el estado de cada consulta vive en espacios de trabajo por hilo y en el
+        # resultado devuelto
+        self._lock = threading.Lock()
+        self._landmarks_lock = threading.Lock()
+        self._hierarchy_lock = threading.Lock()
+
+    @classmethod
+    def from_graph(cls, graph: CompiledGraph, **kwargs) -> "AStarPathFinder":
+        """Crea el buscador sobre un grafo ya compilado (por ejemplo, una instantánea)."""
+        return cls(NodeTable(graph), EdgeTable(graph), graph=graph, **kwargs)
+
+    def _worker_args(self) -> Tuple:
+        # Argumentos para reconstruir este buscador en otro proceso: la instantánea
+        # se vuelve a mapear (páginas compartidas); si no hay, se copian los datos
+        graph = self.graph
+        source = graph.snapshot_path or (dict(self.nodes), dict(self.edges))
+        # Los cambios dinámicos de pesos no están en la instantánea: se reaplican
+        return source, self.landmarks_path, self.ch_path, self.table_path, graph.edge_overrides()
 
     def heuristic(self, node: str, goal: str) -> float:
         n, g = self.nodes[node], self.nodes[goal]
@@ -17,33 +75,687 @@ class AStarPathFinder:
         n1, n2 = self.nodes[node1], self.nodes[node2]
         return haversine_distance(n1["lat"], n1["lon"], n2["lat"], n2["lon"])
 
-    def find_path(self, start: str, goal: str) -> Tuple[Optional[List[str]], float, int]:
-        self.explored = []
-        self.frontier = []
-        counter = 0
-        heapq.heappush(self.frontier, (0.0, counter, start, [start], 0.0))
-        visited = set()
+    def nearest_nodes(self, lat: float, lon: float, k: int = 1) -> List[Tuple[str, float]]:
+        """Los ``k`` nodos más cercanos a unas coordenadas, con su distancia en km."""
+        names = self.graph.names
+        return [(names[i], d) for i, d in self._spatial_index().nearest(lat, lon, k)]
+
+    def nodes_within(self, lat: float, lon: float, km: float) -> List[Tuple[str, float]]:
+        """Nodos a ``km`` kilómetros o menos de unas coordenadas, del más cercano al más lejano."""
+        names = self.graph.names
+        return [(names[i], d) for i, d in self._spatial_index().within_radius(lat, lon, km)]
+
+    def snap(self, location: Location) -> str:
+        """Nombre del nodo de ``location``: el propio nombre o el nodo más cercano a (lat, lon)."""
+        if isinstance(location, str):
+            return location
+        lat, lon = location
+        return self.graph.names[self._spatial_index().nearest(lat, lon)[0][0]]
+
+    def find_path(self, start: Location, goal: Location, mode: str = "unidirectional",
+                  heuristic: str = "euclidean") -> RouteResult:
+        """
+        Busca la ruta óptima entre ``start`` y ``goal``.
+
+        Si existe una tabla de distancias precalculada para este grafo, la ruta se
+        obtiene de ella sin búsqueda (con cualquier modo y heurística).
+
+        Args:
+            start, goal: Nombres de los nodos de inicio y destino, o coordenadas
+                (lat, lon) que se ajustan al nodo más cercano
+            mode: ``"unidirectional"`` (A* clásico), ``"bidirectional"`` (A* desde
+                ambos extremos con potenciales promediados) o ``"ch"`` (Contraction
+                Hierarchies precalculadas; con pesos modificados la jerarquía no
+                sirve y se usa A* bidireccional con Haversine)
+            heuristic: Una de ``HEURISTICS``
+
+        Returns:
+            RouteResult con la ruta (None si no existe), la distancia en km, el
+            conjunto de nodos explorados y las estadísticas por dirección (más el
+            perfil de la consulta si hay un perfilador activo)
+        """
+        self.validate(mode, heuristic)
+        graph = self.graph
+        profiler = self.profiler
+        if profiler is not None:
+            trace = profiler.begin(graph.heap_operations())
+        s, t = graph.id_of(self.snap(start)), graph.id_of(self.snap(goal))
+        if profiler is not None:
+            trace.lap("snap")
+        table = self._distance_table()
+        backward: List[int] = []
+        arrivals: Optional[List[float]] = None
+        if table is not None:
+            if profiler is not None:
+                trace.lap("prepare")
+            path, cost = table.route(s, t)
+            forward: List[int] = []
+            origin = "table"
+            if path is not None:
+                arrivals = [float(table.dist[s, v]) for v in path]
+        else:
+            origin = "search"
+            if mode == "ch":
+                hierarchy = self._contraction_hierarchy()
+                if hierarchy is None:
+                    # Pesos modificados: la jerarquía no sirve y reconstruirla cuesta
+                    # mucho más que una búsqueda, así que se responde con A* bidireccional
+                    mode, heuristic = "bidirectional", "haversine"
+            elif heuristic == "alt":
+                self._landmark_table()
+            if profiler is not None:
+                trace.lap("prepare")
+            if mode == "unidirectional":
+                path, cost, forward, arrivals = self._search(s, t, heuristic)
+            elif mode == "bidirectional":
+                path, cost, forward, backward, arrivals = self._search_bidirectional(s, t, heuristic)
+            else:
+                path, cost, forward, backward = hierarchy.query(s, t)
+        if profiler is None:
+            return make_result(graph, path, cost, forward, backward, origin, arrivals)
+
+        trace.lap("search")
+        result = make_result(graph, path, cost, forward, backward, origin, arrivals)
+        trace.lap("result")
+        profile = profiler.finish(trace, graph.heap_operations(), mode,
+                                  heuristic if mode != "ch" else "-",
+                                  len(forward) + len(backward),
+                                  len(path) if path is not None else None)
+        return replace(result, profile=profile)
+
+    def validate(self, mode: str, heuristic: str) -> None:
+        """Comprueba el modo y la heurística de una consulta (ValueError si no existen)."""
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Heurística desconocida: {heuristic!r}")
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Modo de búsqueda desconocido: {mode!r}")
+
+    def find_paths(self, queries: Iterable[Tuple[Location, Location]], mode: str = "unidirectional",
+                   heuristic: str = "euclidean", max_workers: Optional[int] = None,
+                   executor: str = "thread") -> List[RouteResult]:
+        """
+        Resuelve varias consultas (inicio, destino) en paralelo.
+
+        Args:
+            queries: Pares (inicio, destino)
+            mode, heuristic: Como en ``find_path``
+            max_workers: Número de hilos o procesos (por defecto, el de concurrent.futures)
+            executor: ``"thread"`` comparte esta instancia entre hilos; ``"process"``
+                crea un buscador por proceso, útil porque la búsqueda es Python puro
+                y los hilos comparten el GIL
+
+        Returns:
+            Un RouteResult por consulta, en el mismo orden
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Ejecutor desconocido: {executor!r}")
+        queries = list(queries)
+        if executor == "thread":
+            def task(query: Tuple[Location, Location]) -> RouteResult:
+                return self.find_path(query[0], query[1], mode, heuristic)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                return list(pool.map(task, queries))
+
+        workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=self._worker_args()) as pool:
+            # Las coordenadas se ajustan aquí para no construir el índice en cada proceso
+            jobs = [(self.snap(start), self.snap(goal), mode, heuristic) for start, goal in queries]
+            return list(pool.map(_worker_find_path, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+
+    def one_to_many(self, source: str, targets: Sequence[str],
+                    return_paths: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, List[Optional[Tuple[str, ...]]]]]:
+        """
+        Distancias desde ``source`` a varios destinos con una sola expansión.
+
+        Se usa Dijkstra (no hay un único destino hacia el que orientar la heurística)
+        y la búsqueda se detiene en cuanto todos los destinos están asentados.
+
+        Args:
+            source: Nodo de origen
+            targets: Nodos de destino
+            return_paths: Si es True, también devuelve la ruta a cada destino
+
+        Returns:
+            Vector NumPy de distancias en km (``inf`` si no hay camino) y, si se
+            pide, la lista de rutas (None si no hay camino)
+        """
+        graph = self.graph
+        s = graph.id_of(source)
+        t_ids = [graph.id_of(t) for t in targets]
+        table = self._distance_table()
+        if table is not None:
+            costs = np.array(table.dist[s, t_ids], dtype=np.float64)
+            if not return_paths:
+                return costs
+            routes = (table.route(s, t)[0] for t in t_ids)
+            return costs, [tuple(graph.names[v] for v in r) if r is not None else None for r in routes]
 
-        while self.frontier:
-            f_score, _, current, path, g_score = heapq.heappop(self.frontier)
-            if current in visited:
-                continue
-            visited.add(current)
-            self.explored.append(current)
+        ws, gen, _ = self._dijkstra(s, goals=set(t_ids))
+        costs = np.full(len(t_ids), np.inf)
+        paths: List[Optional[Tuple[str, ...]]] = []
+        for i, t in enumerate(t_ids):
+            settled = ws.closed[t] == gen
+            if settled:
+                costs[i] = ws.g[t]
+            if return_paths:
+                paths.append(tuple(graph.names[v] for v in ws.path_to(t)) if settled else None)
+        return (costs, paths) if return_paths else costs
+
+    def many_to_many(self, sources: Sequence[str], targets: Sequence[str], return_paths: bool = False,
+                     max_workers: Optional[int] = None, executor: Optional[str] = None
+                     ) -> Union[np.ndarray, Tuple[np.ndarray, List[List[Optional[Tuple[str, ...]]]]]]:
+        """
+        Matriz de distancias de N orígenes a M destinos (una expansión por origen).
+
+        Args:
+            sources, targets: Nodos de origen y de destino
+            return_paths: Si es True, también devuelve las rutas (lista N×M)
+            max_workers: Número de hilos o procesos si se usa ``executor``
+            executor: None (en este proceso), ``"thread"`` o ``"process"``; para N
+                grande conviene ``"process"``, cada proceso con su propio buscador
+
+        Returns:
+            Matriz NumPy N×M de distancias en km y, si se pide, las rutas
+        """
+        sources, targets = list(sources), list(targets)
+        if executor is None:
+            rows = [self.one_to_many(source, targets, return_paths) for source in sources]
+        elif executor == "thread":
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                rows = list(pool.map(lambda source: self.one_to_many(source, targets, return_paths), sources))
+        elif executor == "process":
+            workers = max_workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=self._worker_args()) as pool:
+                jobs = [(source, targets, return_paths) for source in sources]
+                rows = list(pool.map(_worker_one_to_many, jobs, chunksize=max(1, len(jobs) // (4 * workers))))
+        else:
+            raise ValueError(f"Ejecutor desconocido: {executor!r}")
+
+        if not return_paths:
+            return np.array(rows, dtype=np.float64).reshape(len(sources), len(targets))
+        costs = np.array([row[0] for row in rows], dtype=np.float64).reshape(len(sources), len(targets))
+        return costs, [row[1] for row in rows]
+
+    def find_k_paths(self, start: Location, goal: Location, k: int = 3, max_overlap: float = 1.0,
+                     max_candidates: Optional[int] = None) -> List[RouteResult]:
+        """
+        Hasta ``k`` rutas sin ciclos de ``start`` a ``goal``, de la más corta a la
+        más larga (algoritmo de Yen).
+
+        Se calcula una sola vez el árbol de caminos mínimos inverso hacia el
+        destino. Cada desvío prueba primero el camino del árbol desde su nodo de
+        desvío, que no requiere búsqueda; solo si ese camino usa un nodo o arista
+        bloqueados se lanza A* con la distancia del árbol como heurística exacta.
+
+        Args:
+            start, goal: Nombres de los nodos o coordenadas (lat, lon)
+            k: Número de rutas pedidas
+            max_overlap: Fracción máxima (0-1) de la longitud de una ruta que puede
+                compartir con alguna ruta ya aceptada; con 1.0 se aceptan todas
+            max_candidates: Rutas examinadas como máximo (por defecto, ``10 * k``),
+                ya que con un límite de solapamiento estricto puede no haber ``k``
+
+        Returns:
+            Lista de RouteResult; los nodos explorados de cada resultado son los que
+            expandió la búsqueda de su desvío
+        """
+        graph = self.graph
+        s, t = graph.id_of(self.snap(start)), graph.id_of(self.snap(goal))
+        to_goal, next_hop, _ = graph.shortest_path_tree(t, reverse=True)
+        if k <= 0 or to_goal[s] == INF:
+            return []
+        limit = max_candidates if max_candidates is not None else 10 * k
+
+        path, _, _ = self._spur_path(s, t, set(), set(), to_goal, next_hop)
+        current: Tuple[List[int], float, List[int]] = (path, to_goal[s], [])
+        examined: List[List[int]] = []
+        accepted: List[Tuple[List[int], float, List[int]]] = []
+        candidates: List[Tuple[float, Tuple[int, ...], List[int]]] = []
+        seen = {tuple(path)}
+        while True:
+            path, cost, explored = current
+            examined.append(path)
+            if all(self._shared_cost(path, other) <= max_overlap * cost for other, _, _ in accepted):
+                accepted.append(current)
+            if len(accepted) >= k or len(examined) >= limit:
+                break
+
+            # Desvíos desde cada nodo de la ruta, con las aristas ya usadas por
+            # rutas anteriores con la misma raíz bloqueadas
+            blocked_next: List[set] = [set() for _ in path]
+            for other in examined:
+                # Las rutas con la misma raíz hasta el nodo i bloquean su arista siguiente
+                i = 0
+                while i < len(path) and i < len(other) - 1 and other[i] == path[i]:
+                    blocked_next[i].add(other[i + 1])
+                    i += 1
+            root_cost = 0.0
+            for i in range(len(path) - 1):
+                spur, root = path[i], path[:i + 1]
+                spur_path, spur_cost, spur_explored = self._spur_path(
+                    spur, t, set(root[:-1]), blocked_next[i], to_goal, next_hop)
+                if spur_path is not None:
+                    candidate = tuple(root[:-1] + spur_path)
+                    if candidate not in seen:
+                        seen.add(candidate)
+                        heapq.heappush(candidates, (root_cost + spur_cost, candidate, spur_explored))
+                root_cost += graph.edge_cost(path[i], path[i + 1])
+            if not candidates:
+                break
+            cost, candidate, explored = heapq.heappop(candidates)
+            current = (list(candidate), cost, explored)
+
+        return [make_result(graph, path, cost, explored, []) for path, cost, explored in accepted]
+
+    def _shared_cost(self, path: List[int], other: List[int]) -> float:
+        # Longitud (km) de las aristas de ``path`` que también están en ``other``
+        other_edges = set(zip(other, other[1:]))
+        return sum(self.graph.edge_cost(u, v) for u, v in zip(path, path[1:]) if (u, v) in other_edges)
+
+    def _spur_path(self, spur: int, goal: int, blocked_nodes: set, blocked_next: set,
+                   to_goal: Sequence[float], next_hop: Sequence[int]) -> Tuple[Optional[List[int]], float, List[int]]:
+        # Camino mínimo de ``spur`` a ``goal`` sin pasar por ``blocked_nodes`` ni por
+        # las aristas spur -> ``blocked_next``. Devuelve (camino, costo, expandidos).
+        def tree_path(v: int) -> List[int]:
+            path = [v]
+            while path[-1] != goal:
+                path.append(next_hop[path[-1]])
+            return path
+
+        first = next_hop[spur]
+        clear = {goal: True, spur: spur == goal}
+        for v in blocked_nodes:
+            clear[v] = False
+
+        def is_clear(v: int) -> bool:
+            # True si el camino del árbol desde ``v`` no toca nodos bloqueados (ni el
+            # propio desvío, para que la ruta no tenga ciclos); memoriza el recorrido
+            walk = []
+            while v not in clear:
+                walk.append(v)
+                v = next_hop[v]
+            result = clear[v]
+            for w in walk:
+                clear[w] = result
+            return result
+
+        if spur == goal or (first not in blocked_next and is_clear(first)):
+            return tree_path(spur), to_goal[spur], []
+
+        # El camino del árbol está bloqueado: A* con la distancia del árbol (exacta
+        # en el grafo sin bloqueos, y por tanto consistente con ellos) como
+        # heurística. En cuanto se extrae un nodo cuyo camino del árbol está libre,
+        # su f es el costo real y ningún otro camino puede mejorarlo.
+        graph = self.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        ws = graph.workspace()
+        gen = ws.begin()
+        stamp, closed, g, parent = ws.stamp, ws.closed, ws.g, ws.parent
+        frontier = ws.heap
+        explored: List[int] = []
+        stamp[spur] = gen
+        g[spur] = 0.0
+        parent[spur] = -1
+        frontier.push(spur, to_goal[spur])
+        while frontier:
+            _, current = frontier.pop()
+            closed[current] = gen
+            explored.append(current)
+            if current != spur and is_clear(current):
+                return ws.path_to(current) + tree_path(current)[1:], g[current] + to_goal[current], explored
+            g_score = g[current]
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[e]
+                if closed[neighbor] == gen or neighbor in blocked_nodes or to_goal[neighbor] == INF:
+                    continue
+                if current == spur and neighbor in blocked_next:
+                    continue
+                new_g = g_score + weights[e]
+                if new_g == INF or (stamp[neighbor] == gen and new_g >= g[neighbor]):
+                    continue
+                stamp[neighbor] = gen
+                g[neighbor] = new_g
+                parent[neighbor] = current
+                frontier.push(neighbor, new_g + to_goal[neighbor])
+        return None, INF, explored
+
+    def reachable(self, source: Location, max_minutes: float) -> Dict[str, float]:
+        """
+        Nodos alcanzables a pie desde ``source`` en ``max_minutes`` minutos o menos.
+
+        Es un Dijkstra de uno a todos acotado: no se encolan vecinos más allá del
+        presupuesto, así que solo se recorre el subgrafo alcanzable y el coste no
+        depende del tamaño total de la red.
+
+        Args:
+            source: Nombre del nodo de partida o coordenadas (lat, lon)
+            max_minutes: Presupuesto de tiempo caminando a 5 km/h
+
+        Returns:
+            Diccionario nombre -> minutos de llegada, del más cercano al más lejano
+        """
+        graph = self.graph
+        ws, _, settled = self._dijkstra(graph.id_of(self.snap(source)),
+                                        max_cost=max_minutes / WALKING_MINUTES_PER_KM)
+        names, g = graph.names, ws.g
+        return {names[v]: g[v] * WALKING_MINUTES_PER_KM for v in settled}
+
+    def set_edge_cost(self, u: str, v: str, cost: float) -> int:
+        """
+        Cambia el peso (km) de la arista ``u -> v`` y devuelve la nueva versión del grafo.
+
+        Las cachés que dependen de la versión o de la huella del grafo (rutas,
+        landmarks, jerarquía, tabla de distancias) dejan de usarse automáticamente.
+
+        Un costo menor que la distancia en línea recta entre ``u`` y ``v`` es válido,
+        pero las heurísticas ``"euclidean"`` y ``"haversine"`` (y la de ``LPAStar``)
+        dejan de ser cotas inferiores y pueden devolver rutas no óptimas (también el
+        modo ``"ch"``, que con pesos modificados usa A* con Haversine); ``"alt"``
+        (que recalcula sus landmarks) y Dijkstra siguen siendo exactos.
+
+        Raises:
+            ValueError: Si ``cost`` es negativo o NaN
+        """
+        graph = self.graph
+        return graph.set_edge_cost(graph.id_of(u), graph.id_of(v), cost)
+
+    def remove_edge(self, u: str, v: str) -> int:
+        """Cierra la arista ``u -> v`` (por ejemplo, un puente cortado)."""
+        graph = self.graph
+        return graph.remove_edge(graph.id_of(u), graph.id_of(v))
+
+    def restore_edge(self, u: str, v: str) -> int:
+        """Reabre la arista ``u -> v`` con su peso original."""
+        graph = self.graph
+        return graph.restore_edge(graph.id_of(u), graph.id_of(v))
+
+    def use_landmarks(self, table: LandmarkTable) -> None:
+        """Asigna una tabla de landmarks ya calculada para la heurística ``"alt"``."""
+        if not table.matches(self.graph):
+            raise ValueError("La tabla de landmarks no corresponde a este grafo")
+        self.landmarks = table
+
+    def _landmark_table(self) -> LandmarkTable:
+        # Se carga (o calcula y guarda) la primera vez que se pide la heurística ALT. La
+        # tabla se conserva mientras los cambios de pesos solo suban costes o cierren
+        # aristas; solo se recalcula si algún peso baja respecto al de la tabla
+        graph = self.graph
+        table = self.landmarks
+        if table is not None and table.admissible(graph):
+            return table
+        with self._landmarks_lock:
+            table = self.landmarks
+            if table is None or not table.admissible(graph):
+                table = None
+                if self.landmarks_path and not graph.modified:
+                    table = load_or_build_landmarks(graph, self.landmarks_path)
+                elif self.landmarks_path and os.path.exists(self.landmarks_path):
+                    # Con pesos modificados no se sobrescribe la tabla del grafo base,
+                    # pero se aprovecha si sigue siendo válida
+                    stored = LandmarkTable.load(self.landmarks_path)
+                    table = stored if stored.admissible(graph) else None
+                if table is None:
+                    table = LandmarkTable.build(graph)
+                self.landmarks = table
+            return table
+
+    def use_hierarchy(self, hierarchy: ContractionHierarchy) -> None:
+        """Asigna una jerarquía de contracción ya construida para el modo ``"ch"``."""
+        if not hierarchy.matches(self.graph):
+            raise ValueError("La jerarquía de contracción no corresponde a este grafo")
+        self.hierarchy = hierarchy
+
+    def _contraction_hierarchy(self) -> Optional[ContractionHierarchy]:
+        # Se carga (o construye y guarda) la primera vez que se pide el modo "ch". Con
+        # pesos modificados no se reconstruye: devuelve None y la consulta usa A*
+        graph = self.graph
+        hierarchy = self.hierarchy
+        if hierarchy is not None and hierarchy.matches(graph):
+            return hierarchy
+        if graph.modified:
+            return None
+        with self._hierarchy_lock:
+            if self.hierarchy is None or not self.hierarchy.matches(graph):
+                if self.ch_path:
+                    self.hierarchy = load_or_build_hierarchy(graph, self.ch_path)
+                else:
+                    self.hierarchy = ContractionHierarchy.build(graph)
+            return self.hierarchy
+
+    def use_distance_table(self, table: Optional[DistanceTable]) -> None:
+        """Asigna (o quita, con None) la tabla de distancias de todos los pares."""
+        if table is not None and not table.matches(self.graph):
+            raise ValueError("La tabla de distancias no corresponde a este grafo")
+        with self._lock:
+            self.distance_table = table
+            self._table_checked = True
+
+    def _spatial_index(self) -> SpatialIndex:
+        # Se construye la primera vez que se consulta por coordenadas
+        if self.spatial is not None:
+            return self.spatial
+        with self._lock:
+            if self.spatial is None:
+                self.spatial = SpatialIndex(self.graph.lat, self.graph.lon)
+            return self.spatial
+
+    def _distance_table(self) -> Optional[DistanceTable]:
+        # La tabla solo se usa si existe en disco y corresponde al grafo actual;
+        # si no, las consultas recurren a la búsqueda
+        if not self._table_checked:
+            with self._lock:
+                if not self._table_checked:
+                    if self.table_path and os.path.exists(self.table_path):
+                        table = DistanceTable.load(self.table_path)
+                        self.distance_table = table if table.matches(self.graph) else None
+                    self._table_checked = True
+        table = self.distance_table
+        return table if table is not None and table.matches(self.graph) else None
+
+    def _potential(self, node: int, heuristic: str, towards: bool = True) -> Callable[[int], float]:
+        # Cota inferior de d(v, node) si ``towards``; de d(node, v) en caso contrario
+        if heuristic == "alt":
+            table = self._landmark_table()
+            potential = table.potential_to(node) if towards else table.potential_from(node)
+        else:
+            distance = euclidean_distance if heuristic == "euclidean" else haversine_distance
+            lat, lon = self.graph.lat, self.graph.lon
+            node_lat, node_lon = lat[node], lon[node]
+            potential = lambda v: distance(lat[v], lon[v], node_lat, node_lon)
+        # Solo se envuelve la heurística (y se paga la llamada extra) si se está midiendo
+        trace = self.profiler.current() if self.profiler is not None else None
+        if trace is not None:
+            return trace.count(potential, distance=heuristic != "alt")
+        return potential
+
+    def _search(self, start: int, goal: int,
+                heuristic: str = "euclidean") -> Tuple[Optional[List[int]], float, List[int], Optional[List[float]]]:
+        # Núcleo A* sobre el grafo compilado: punteros a predecesor, cola con
+        # decrease-key y un espacio de trabajo por hilo reutilizado entre consultas.
+        # Devuelve el camino, su costo, los nodos expandidos y g en cada nodo del camino
+        graph = self.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        potential = self._potential(goal, heuristic)
+
+        ws = graph.workspace()
+        gen = ws.begin()
+        stamp, closed, g, h, parent = ws.stamp, ws.closed, ws.g, ws.h, ws.parent
+        frontier = ws.heap
+        explored: List[int] = []
+
+        stamp[start] = gen
+        g[start] = 0.0
+        parent[start] = -1
+        frontier.push(start, 0.0)
+
+        while frontier:
+            _, current = frontier.pop()
+            closed[current] = gen
+            explored.append(current)
 
             if current == goal:
-                return path, g_score, len(self.explored)
+                path = ws.path_to(goal)
+                return path, g[goal], explored, [g[v] for v in path]
+
+            g_score = g[current]
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[e]
+                if closed[neighbor] == gen:
+                    continue
+                new_g = g_score + weights[e]
+                if new_g == INF:
+                    continue  # arista cerrada
+                if stamp[neighbor] != gen:
+                    stamp[neighbor] = gen
+                    h[neighbor] = potential(neighbor)
+                elif new_g >= g[neighbor]:
+                    continue
+                g[neighbor] = new_g
+                parent[neighbor] = current
+                frontier.push(neighbor, new_g + h[neighbor])
+
+        return None, float("inf"), explored, None
+
+    def _search_bidirectional(self, start: int, goal: int, heuristic: str = "euclidean"
+                              ) -> Tuple[Optional[List[int]], float, List[int], List[int], Optional[List[float]]]:
+        # A* bidireccional con potenciales promediados p(v) = (h(v, goal) - h(start, v)) / 2:
+        # la búsqueda hacia adelante usa p y la inversa -p, ambos consistentes, así
+        # que se puede detener cuando min_adelante + min_atrás >= mejor costo conocido.
+        graph = self.graph
+        if start == goal:
+            return [start], 0.0, [start], [], [0.0]
+        to_goal = self._potential(goal, heuristic)
+        from_start = self._potential(start, heuristic, towards=False)
+
+        sides = []
+        for slot, (offsets, targets, weights), source in (
+            (0, (graph.offsets, graph.targets, graph.weights), start),
+            (1, (graph.rev_offsets, graph.rev_sources, graph.rev_weights), goal),
+        ):
+            ws = graph.workspace(slot)
+            gen = ws.begin()
+            ws.stamp[source] = gen
+            ws.g[source] = 0.0
+            ws.parent[source] = -1
+            ws.heap.push(source, 0.0)
+            sides.append((ws, gen, offsets, targets, weights, 1.0 if slot == 0 else -1.0, []))
+        fw, bw = sides[0][0], sides[1][0]
+
+        best, meet = float("inf"), -1
+        while fw.heap and bw.heap:
+            if fw.heap.peek_key() + bw.heap.peek_key() >= best:
+                break
+            # Se expande la dirección con la frontera más pequeña
+            side, other = (sides[0], sides[1]) if len(fw.heap) <= len(bw.heap) else (sides[1], sides[0])
+            ws, gen, offsets, targets, weights, sign, explored = side
+            other_ws, other_gen = other[0], other[1]
+            stamp, closed, g, h, parent = ws.stamp, ws.closed, ws.g, ws.h, ws.parent
+            other_stamp, other_g = other_ws.stamp, other_ws.g
+
+            _, current = ws.heap.pop()
+            closed[current] = gen
+            explored.append(current)
 
-            for neighbor in self.edges.get(current, []):
-                if neighbor in visited:
+            g_score = g[current]
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[e]
+                if closed[neighbor] == gen:
                     continue
-                edge_cost = self.get_distance(current, neighbor)
-                new_g = g_score + edge_cost
-                h = self.heuristic(neighbor, goal)
-                counter += 1
-                heapq.heappush(self.frontier, (new_g + h, counter, neighbor, path + [neighbor], new_g))
+                new_g = g_score + weights[e]
+                if new_g == INF:
+                    continue  # arista cerrada
+                if stamp[neighbor] != gen:
+                    stamp[neighbor] = gen
+                    h[neighbor] = sign * 0.5 * (to_goal(neighbor) - from_start(neighbor))
+                elif new_g >= g[neighbor]:
+                    continue
+                g[neighbor] = new_g
+                parent[neighbor] = current
+                ws.heap.push(neighbor, new_g + h[neighbor])
+                if other_stamp[neighbor] == other_gen and new_g + other_g[neighbor] < best:
+                    best, meet = new_g + other_g[neighbor], neighbor
+
+        forward, backward = sides[0][6], sides[1][6]
+        if meet < 0:
+            return None, float("inf"), forward, backward, None
+        path = fw.path_to(meet)
+        # g hacia adelante hasta el punto de encuentro; después, lo que falta hasta el destino
+        arrivals = [fw.g[v] for v in path]
+        node = bw.parent[meet]
+        while node >= 0:
+            path.append(node)
+            arrivals.append(best - bw.g[node])
+            node = bw.parent[node]
+        return path, best, forward, backward, arrivals
+
+    def _dijkstra(self, source: int, goals: Optional[set] = None,
+                  max_cost: float = float("inf")) -> Tuple[SearchWorkspace, int, List[int]]:
+        # Dijkstra de uno a muchos sobre el espacio de trabajo del hilo. Se detiene
+        # cuando todos los ``goals`` están asentados o la distancia supera
+        # ``max_cost``; solo toca los nodos alcanzados. Devuelve el espacio de trabajo
+        # (válido hasta la siguiente búsqueda del hilo), su generación y los nodos
+        # asentados en orden.
+        graph = self.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        ws = graph.workspace()
+        gen = ws.begin()
+        stamp, closed, g, parent = ws.stamp, ws.closed, ws.g, ws.parent
+        frontier = ws.heap
+        settled: List[int] = []
+        remaining = len(goals) if goals is not None else -1
+
+        stamp[source] = gen
+        g[source] = 0.0
+        parent[source] = -1
+        frontier.push(source, 0.0)
+        while frontier and remaining != 0:
+            g_score, current = frontier.pop()
+            if g_score > max_cost:
+                break
+            closed[current] = gen
+            settled.append(current)
+            if goals is not None and current in goals:
+                remaining -= 1
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[e]
+                if closed[neighbor] == gen:
+                    continue
+                new_g = g_score + weights[e]
+                if new_g > max_cost or new_g == INF or (stamp[neighbor] == gen and new_g >= g[neighbor]):
+                    continue
+                stamp[neighbor] = gen
+                g[neighbor] = new_g
+                parent[neighbor] = current
+                frontier.push(neighbor, new_g)
+        return ws, gen, settled
+
+# Buscador propio de cada proceso del ProcessPoolExecutor de ``find_paths``
+_worker_pathfinder: Optional[AStarPathFinder] = None
+
+def _init_worker(source: Union[str, Tuple[Mapping, Mapping]], landmarks_path: Optional[str],
+                 ch_path: Optional[str], table_path: Optional[str],
+                 overrides: Sequence[Tuple[int, float]] = ()) -> None:
+    global _worker_pathfinder
+    paths = dict(landmarks_path=landmarks_path, ch_path=ch_path, table_path=table_path)
+    if isinstance(source, str):
+        _worker_pathfinder = AStarPathFinder.from_graph(load_snapshot(source), **paths)
+    else:
+        _worker_pathfinder = AStarPathFinder(*source, **paths)
+    _worker_pathfinder.graph.apply_overrides(overrides)
+
+def _worker_find_path(query: Tuple[str, str, str, str]) -> RouteResult:
+    start, goal, mode, heuristic = query
+    return _worker_pathfinder.find_path(start, goal, mode, heuristic)
 
-        return None, float("inf"), len(self.explored)
+def _worker_one_to_many(job: Tuple[str, List[str], bool]):
+    source, targets, return_paths = job
+    return _worker_pathfinder.one_to_many(source, targets, return_paths)
 
-# Instancia global
-pathfinder = AStarPathFinder(CUENCA_NODES, GRAPH_EDGES)
+# Instancia global. El conjunto de datos se puede cambiar con la variable de entorno
+# CUENCA_GRAPH (archivo .geojson/.osm o directorio con nodes.csv y edges.csv); por
+# defecto se usa el grafo incorporado de graph_data.py.
+pathfinder = AStarPathFinder.from_graph(load_graph(os.environ.get("CUENCA_GRAPH", "cuenca"), SNAPSHOT_PATH),
+                                        landmarks_path=LANDMARKS_PATH, ch_path=CH_PATH, table_path=TABLE_PATH)
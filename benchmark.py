@@ -0,0 +1,304 @@
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from astar import HEURISTICS, AStarPathFinder
+from spatial_index import SpatialIndex
+
+Nodes = Dict[str, Dict]
+Edges = Dict[str, List[str]]
+
+# Centro de Cuenca y separación media entre nodos (~110 m) de los grafos sintéticos
+CENTER_LAT, CENTER_LON = -2.8975, -79.0045
+SPACING = 0.001
+GRAPH_KINDS = ("grid", "geometric", "osm")
+# Combinaciones (modo, heurística) medidas; el modo "ch" ignora la heurística
+ENGINES = tuple((mode, h) for mode in ("unidirectional", "bidirectional") for h in HEURISTICS) + (("ch", "-"),)
+# La construcción de Contraction Hierarchies en Python puro es lenta en grafos grandes
+CH_MAX_NODES = 20000
+# Consultas medidas con tracemalloc (que ralentiza la ejecución) para la memoria pico
+MEMORY_SAMPLE = 20
+# Empeoramiento relativo de p50 a partir del cual --compare marca una regresión
+REGRESSION_THRESHOLD = 0.10
+
+
+# ============= GENERADORES DE GRAFOS =============
+
+def _node(lat: float, lon: float, rng: random.Random) -> Dict:
+    return {"lat": lat, "lon": lon, "descripcion": "", "tiempo": rng.choice((0, 15, 30, 45, 60))}
+
+
+def _connect(edges: Edges, u: str, v: str, oneway: bool = False) -> None:
+    edges.setdefault(u, []).append(v)
+    if not oneway:
+        edges.setdefault(v, []).append(u)
+
+
+def grid_graph(n: int, seed: int = 0) -> Tuple[Nodes, Edges]:
+    """Cuadrícula de ~``n`` nodos con calles de doble sentido y coordenadas ligeramente desplazadas."""
+    rng = random.Random(seed)
+    side = max(2, math.isqrt(n))
+    nodes: Nodes = {}
+    edges: Edges = {}
+    origin_lat = CENTER_LAT - side * SPACING / 2
+    origin_lon = CENTER_LON - side * SPACING / 2
+    for r in range(side):
+        for c in range(side):
+            nodes[f"n{r * side + c}"] = _node(origin_lat + (r + rng.uniform(-0.2, 0.2)) * SPACING,
+                                            origin_lon + (c + rng.uniform(-0.2, 0.2)) * SPACING, rng)
+    for r in range(side):
+        for c in range(side):
+            u = f"n{r * side + c}"
+            if c + 1 < side:
+                _connect(edges, u, f"n{r * side + c + 1}")
+            if r + 1 < side:
+                _connect(edges, u, f"n{(r + 1) * side + c}")
+    return nodes, edges
+
+
+def geometric_graph(n: int, seed: int = 0, degree: int = 4) -> Tuple[Nodes, Edges]:
+    """Puntos aleatorios uniformes; cada uno se une (en ambos sentidos) a sus ``degree`` vecinos más cercanos."""
+    rng = random.Random(seed)
+    half = math.sqrt(n) * SPACING / 2
+    lat = [CENTER_LAT + rng.uniform(-half, half) for _ in range(n)]
+    lon = [CENTER_LON + rng.uniform(-half, half) for _ in range(n)]
+    nodes: Nodes = {f"n{i}": _node(lat[i], lon[i], rng) for i in range(n)}
+    index = SpatialIndex(lat, lon)
+    linked = set()
+    edges: Edges = {}
+    for i in range(n):
+        for j, _ in index.nearest(lat[i], lon[i], degree + 1):
+            pair = (min(i, j), max(i, j))
+            if j != i and pair not in linked:
+                linked.add(pair)
+                _connect(edges, f"n{i}", f"n{j}")
+    return nodes, edges
+
+
+def osm_like_graph(n: int, seed: int = 0, missing: float = 0.15, oneway: float = 0.2,
+                   avenue_every: int = 15) -> Tuple[Nodes, Edges]:
+    """
+    Red con aspecto de ciudad: cuadrícula irregular a la que le faltan calles
+    (``missing``), con calles de un solo sentido (``oneway``) y avenidas
+    diagonales cada ``avenue_every`` filas.
+    """
+    rng = random.Random(seed)
+    side = max(2, math.isqrt(n))
+    nodes: Nodes = {}
+    edges: Edges = {}
+    origin_lat = CENTER_LAT - side * SPACING / 2
+    origin_lon = CENTER_LON - side * SPACING / 2
+    for r in range(side):
+        for c in range(side):
+            nodes[f"n{r * side + c}"] = _node(origin_lat + (r + rng.uniform(-0.35, 0.35)) * SPACING,
+                                            origin_lon + (c + rng.uniform(-0.35, 0.35)) * SPACING, rng)
+
+    def street(u: str, v: str) -> None:
+        if rng.random() < missing:
+            return
+        if rng.random() < oneway:
+            # Sentido único elegido al azar
+            if rng.random() < 0.5:
+                u, v = v, u
+            _connect(edges, u, v, oneway=True)
+        else:
+            _connect(edges, u, v)
+
+    for r in range(side):
+        for c in range(side):
+            u = f"n{r * side + c}"
+            if c + 1 < side:
+                street(u, f"n{r * side + c + 1}")
+            if r + 1 < side:
+                street(u, f"n{(r + 1) * side + c}")
+            if r % avenue_every == 0 and r + 1 < side and c + 1 < side:
+                _connect(edges, u, f"n{(r + 1) * side + c + 1}")
+    return nodes, edges
+
+
+GENERATORS: Dict[str, Callable[..., Tuple[Nodes, Edges]]] = {
+    "grid": grid_graph,
+    "geometric": geometric_graph,
+    "osm": osm_like_graph,
+}
+
+
+def make_workload(names: Sequence[str], count: int, seed: int = 0) -> List[Tuple[str, str]]:
+    """Pares (inicio, destino) aleatorios y reproducibles para una misma semilla."""
+    rng = random.Random(seed)
+    return [tuple(rng.sample(names, 2)) for _ in range(count)]
+
+
+# ============= MEDICIÓN =============
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else float("nan")
+
+
+def run_engine(pathfinder: AStarPathFinder, workload: Sequence[Tuple[str, str]],
+               mode: str, heuristic: str) -> Dict:
+    """
+    Mide una combinación (modo, heurística) sobre la carga de consultas.
+
+    El preprocesamiento (landmarks o jerarquía) se hace y se mide aparte, antes de
+    las consultas. La memoria pico se mide en una pasada adicional con
+    ``tracemalloc`` sobre las primeras ``MEMORY_SAMPLE`` consultas, para no
+    distorsionar las latencias.
+    """
+    graph = pathfinder.graph
+    heuristic = heuristic if mode != "ch" else "euclidean"
+    t0 = time.perf_counter()
+    if mode == "ch":
+        pathfinder._contraction_hierarchy()
+    elif heuristic == "alt":
+        pathfinder._landmark_table()
+    preprocess = time.perf_counter() - t0
+
+    latencies: List[float] = []
+    expanded: List[int] = []
+    found = 0
+    pushes0, pops0, _ = graph.heap_operations()
+    started = time.perf_counter()
+    for start, goal in workload:
+        t = time.perf_counter()
+        result = pathfinder.find_path(start, goal, mode, heuristic)
+        latencies.append(time.perf_counter() - t)
+        expanded.append(result.visited_nodes)
+        found += result.found
+    elapsed = time.perf_counter() - started
+    pushes1, pops1, _ = graph.heap_operations()
+
+    tracemalloc.start()
+    for start, goal in workload[:MEMORY_SAMPLE]:
+        pathfinder.find_path(start, goal, mode, heuristic)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queries = len(workload)
+    return {
+        "engine": f"{mode}/{heuristic}" if mode != "ch" else "ch",
+        "preprocess_s": preprocess,
+        "queries": queries,
+        "found": found,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "mean_ms": float(np.mean(latencies)) * 1000 if queries else float("nan"),
+        "throughput_qps": queries / elapsed if elapsed > 0 else float("inf"),
+        "expanded_mean": float(np.mean(expanded)) if queries else 0.0,
+        "expanded_p99": _percentile(expanded, 99),
+        "heap_pushes_mean": (pushes1 - pushes0) / queries if queries else 0.0,
+        "heap_pops_mean": (pops1 - pops0) / queries if queries else 0.0,
+        "peak_query_kb": peak / 1024,
+    }
+
+
+def run_benchmark(kinds: Sequence[str], sizes: Sequence[int], queries: int, seed: int = 0,
+                  engines: Sequence[Tuple[str, str]] = ENGINES, ch_max_nodes: int = CH_MAX_NODES,
+                  log: Callable[[str], None] = print) -> Dict:
+    """
+    Ejecuta todas las combinaciones de tipo de grafo, tamaño y motor.
+
+    Returns:
+        Diccionario serializable a JSON con ``meta`` (entorno y parámetros) y
+        ``results`` (una entrada por grafo y motor)
+    """
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            # La construcción se mide dos veces: el tiempo sin tracemalloc (que la
+            # ralentiza mucho) y la memoria pico en una pasada aparte
+            t0 = time.perf_counter()
+            nodes, edges = GENERATORS[kind](size, seed)
+            pathfinder = AStarPathFinder(nodes, edges)
+            build = time.perf_counter() - t0
+            del nodes, edges, pathfinder
+            tracemalloc.start()
+            nodes, edges = GENERATORS[kind](size, seed)
+            pathfinder = AStarPathFinder(nodes, edges)
+            _, build_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            graph = pathfinder.graph
+            workload = make_workload(graph.names, queries, seed)
+            log(f"{kind} n={graph.num_nodes} m={graph.num_edges} construido en {build:.2f} s")
+            for mode, heuristic in engines:
+                if mode == "ch" and graph.num_nodes > ch_max_nodes:
+                    log(f"  ch omitido (más de {ch_max_nodes} nodos)")
+                    continue
+                row = run_engine(pathfinder, workload, mode, heuristic)
+                row.update(graph=kind, size=size, nodes=graph.num_nodes, edges=graph.num_edges,
+                           build_s=build, build_peak_kb=build_peak / 1024)
+                results.append(row)
+                log(f"  {row['engine']:<28} p50 {row['p50_ms']:8.2f} ms  p99 {row['p99_ms']:8.2f} ms  "
+                    f"{row['throughput_qps']:8.1f} q/s  expandidos {row['expanded_mean']:9.1f}  "
+                    f"heap {row['heap_pushes_mean'] + row['heap_pops_mean']:9.1f}")
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": seed,
+            "queries": queries,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD,
+            log: Callable[[str], None] = print) -> List[Dict]:
+    """
+    Compara dos ejecuciones por (grafo, tamaño, motor).
+
+    Returns:
+        Las filas cuyo p50 empeoró más de ``threshold`` (fracción) respecto de la base
+    """
+    base = {(r["graph"], r["size"], r["engine"]): r for r in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        old = base.get((row["graph"], row["size"], row["engine"]))
+        if old is None:
+            continue
+        ratio = row["p50_ms"] / old["p50_ms"] if old["p50_ms"] > 0 else float("inf")
+        expanded = row["expanded_mean"] - old["expanded_mean"]
+        flag = "REGRESIÓN" if ratio > 1 + threshold else ""
+        log(f"{row['graph']:<10} {row['size']:>8} {row['engine']:<28} p50 x{ratio:5.2f}  "
+            f"expandidos {expanded:+9.1f}  {flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+if __name__ == "__main__":
+    # Ejemplo: python benchmark.py --sizes 1000 10000 --output bench.json --compare base.json
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de búsqueda sobre grafos sintéticos")
+    parser.add_argument("--kinds", nargs="+", choices=GRAPH_KINDS, default=list(GRAPH_KINDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engines", nargs="+", default=None,
+                        help="Motores modo/heurística (p. ej. bidirectional/alt ch); por defecto, todos")
+    parser.add_argument("--ch-max-nodes", type=int, default=CH_MAX_NODES)
+    parser.add_argument("--output", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    engines = ENGINES
+    if args.engines:
+        engines = tuple(tuple(e.split("/")) if "/" in e else (e, "-") for e in args.engines)
+    report = run_benchmark(args.kinds, args.sizes, args.queries, args.seed, engines, args.ch_max_nodes)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,389 @@
+import hashlib
+import itertools
+import math
+import threading
+from array import array
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from graph_data import haversine_distance
+from search_workspace import IndexedMinHeap, SearchWorkspace
+
+# Tipos de los arreglos CSR: desplazamientos en int64, destinos en int32
+OFFSET_TYPECODE = "q"
+TARGET_TYPECODE = "i"
+WEIGHT_TYPECODES = ("d", "f")  # float64 / float32
+
+# Contador global de versiones: cada grafo (y cada cambio de un grafo) recibe un
+# número distinto, así que la versión identifica el contenido dentro del proceso
+_VERSIONS = itertools.count(1)
+
+
+class CompiledGraph:
+    """
+    Grafo compilado en formato CSR (Compressed Sparse Row).
+
+    Los nodos se identifican con enteros consecutivos y las aristas salientes del
+    nodo ``u`` ocupan el rango ``offsets[u]:offsets[u + 1]`` de ``targets`` y
+    ``weights``. El peso de cada arista (distancia Haversine en km) se calcula
+    una sola vez al compilar, no en cada consulta.
+    """
+
+    def __init__(self, nodes: Mapping[str, Mapping], edges: Mapping[str, Sequence[str]],
+                 weight_typecode: str = "d"):
+        """
+        Args:
+            nodes: Diccionario nombre -> datos del nodo (al menos ``lat`` y ``lon``)
+            edges: Diccionario nombre -> lista de vecinos (mismo formato que GRAPH_EDGES)
+            weight_typecode: ``"d"`` (float64) o ``"f"`` (float32) para los pesos
+        """
+        if weight_typecode not in WEIGHT_TYPECODES:
+            raise ValueError(f"Tipo de peso no soportado: {weight_typecode!r} (use 'd' o 'f')")
+
+        self.names: List[str] = list(nodes)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.lat = array("d", (float(nodes[name]["lat"]) for name in self.names))
+        self.lon = array("d", (float(nodes[name]["lon"]) for name in self.names))
+        self.descriptions: List[str] = [str(nodes[name].get("descripcion", "")) for name in self.names]
+        self.visit_times = array("i", (int(nodes[name].get("tiempo", 0)) for name in self.names))
+        self.weight_typecode = weight_typecode
+        self.snapshot_path: Optional[str] = None
+
+        for name in edges:
+            if name not in self.index:
+                raise ValueError(f"La arista sale de un nodo desconocido: {name!r}")
+
+        offsets = array(OFFSET_TYPECODE, [0])
+        targets = array(TARGET_TYPECODE)
+        weights = array(weight_typecode)
+        lat, lon, index = self.lat, self.lon, self.index
+        for u, name in enumerate(self.names):
+            for neighbor in edges.get(name, ()):
+                v = index.get(neighbor)
+                if v is None:
+                    raise ValueError(f"La arista {name!r} -> {neighbor!r} apunta a un nodo desconocido")
+                targets.append(v)
+                weights.append(haversine_distance(lat[u], lon[u], lat[v], lon[v]))
+            offsets.append(len(targets))
+
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self._build_reverse()
+        self._init_state()
+
+    @classmethod
+    def from_arrays(cls, names: List[str], arrays: Mapping, descriptions: List[str],
+                    snapshot_path: Optional[str] = None) -> "CompiledGraph":
+        """
+        Reconstruye un grafo a partir de sus arreglos (por ejemplo, mapeados en
+        memoria desde una instantánea binaria) sin recalcular nada.
+
+        Args:
+            names: Nombres de los nodos en orden de identificador
+            arrays: ``lat``, ``lon``, ``visit_times``, los CSR directo (``offsets``,
+                ``targets``, ``weights``) e inverso (``rev_offsets``, ``rev_sources``,
+                ``rev_edge``, ``rev_weights``)
+            descriptions: Descripción de cada nodo
+            snapshot_path: Archivo del que provienen los arreglos, si lo hay
+        """
+        graph = cls.__new__(cls)
+        graph.names = names
+        graph.index = {name: i for i, name in enumerate(names)}
+        graph.descriptions = descriptions
+        for field in ("lat", "lon", "visit_times", "offsets", "targets", "weights",
+                      "rev_offsets", "rev_sources", "rev_edge", "rev_weights"):
+            setattr(graph, field, arrays[field])
+        graph.weight_typecode = memoryview(arrays["weights"]).format
+        graph.snapshot_path = snapshot_path
+        graph._init_state()
+        return graph
+
+    def _init_state(self) -> None:
+        self._local = threading.local()
+        self._fingerprint = None
+        self.version = next(_VERSIONS)
+        # Cambios dinámicos de pesos: peso original de cada arista modificada y
+        # registro (versión, u, v) de cada cambio, en orden
+        self._original: Dict[int, float] = {}
+        self._changes: List[Tuple[int, int, int]] = []
+        # Huella del grafo antes del primer cambio (para tablas calculadas sobre él)
+        self._base_fingerprint: Optional[str] = None
+        self._write_lock = threading.Lock()
+
+    def _build_reverse(self) -> None:
+        # Adyacencia inversa (aristas entrantes) en CSR, necesaria para buscar hacia
+        # atrás desde el destino: GRAPH_EDGES no garantiza que el grafo sea simétrico.
+        # ``rev_edge[k]`` es el índice de la arista original en ``targets``/``weights``.
+        n, offsets, targets = self.num_nodes, self.offsets, self.targets
+        counts = [0] * (n + 1)
+        for v in targets:
+            counts[v + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        rev_offsets = array(OFFSET_TYPECODE, counts)
+        fill = counts[:n]
+        rev_sources = array(TARGET_TYPECODE, [0]) * len(targets)
+        rev_edge = array(OFFSET_TYPECODE, [0]) * len(targets)
+        for u in range(n):
+            for e in range(offsets[u], offsets[u + 1]):
+                k = fill[targets[e]]
+                fill[targets[e]] = k + 1
+                rev_sources[k] = u
+                rev_edge[k] = e
+        self.rev_offsets = rev_offsets
+        self.rev_sources = rev_sources
+        self.rev_edge = rev_edge
+        self.rev_weights = array(self.weight_typecode, (self.weights[e] for e in rev_edge))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.targets)
+
+    def id_of(self, name: str) -> int:
+        return self.index[name]
+
+    def name_of(self, node_id: int) -> str:
+        return self.names[node_id]
+
+    def node_data(self, node_id: int) -> Dict:
+        """Datos del nodo con el mismo formato que las entradas de CUENCA_NODES."""
+        return {"lat": self.lat[node_id], "lon": self.lon[node_id],
+                "descripcion": self.descriptions[node_id], "tiempo": self.visit_times[node_id]}
+
+    def workspace(self, slot: int = 0) -> SearchWorkspace:
+        """
+        Devuelve el espacio de trabajo del hilo actual para este grafo.
+
+        Cada hilo tiene sus propios arreglos, de modo que consultas concurrentes no
+        comparten estado. ``slot`` permite a una misma búsqueda usar varios espacios
+        a la vez (por ejemplo, uno por dirección en la búsqueda bidireccional).
+        """
+        spaces = getattr(self._local, "spaces", None)
+        if spaces is None:
+            spaces = self._local.spaces = {}
+        ws = spaces.get(slot)
+        if ws is None or ws.size != self.num_nodes:
+            ws = spaces[slot] = SearchWorkspace(self.num_nodes)
+        return ws
+
+    def heap_operations(self) -> Tuple[int, int, int]:
+        """
+        Operaciones (inserciones o decrease-key, extracciones, decrease-key)
+        acumuladas por las colas de los espacios de trabajo del hilo actual; la
+        diferencia entre dos lecturas es el trabajo de las consultas hechas entre
+        ambas en este hilo.
+        """
+        spaces = getattr(self._local, "spaces", None) or {}
+        return (sum(ws.heap.pushes for ws in spaces.values()),
+                sum(ws.heap.pops for ws in spaces.values()),
+                sum(ws.heap.decreases for ws in spaces.values()))
+
+    def fingerprint(self) -> str:
+        """
+        Huella (SHA-1) del contenido del grafo: nombres, estructura y pesos.
+
+        Permite comprobar que una tabla precalculada guardada en disco corresponde
+        exactamente a este grafo.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha1()
+            digest.update("\0".join(self.names).encode("utf-8"))
+            for data in (self.offsets, self.targets, self.weights):
+                digest.update(memoryview(data).cast("B"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    # ============= CAMBIOS DINÁMICOS =============
+
+    def set_edge_cost(self, u: int, v: int, cost: float) -> int:
+        """
+        Cambia el peso de las aristas ``u -> v`` (en ambos CSR) y devuelve la nueva
+        versión del grafo.
+
+        Los arreglos mapeados desde una instantánea son de solo lectura: el primer
+        cambio copia los pesos a memoria y el archivo no se modifica.
+
+        Raises:
+            ValueError: Si ``cost`` es negativo o NaN (``inf`` cierra la arista)
+        """
+        if math.isnan(cost) or cost < 0:
+            raise ValueError(f"Costo de arista inválido: {cost!r} (debe ser >= 0)")
+        with self._write_lock:
+            edges = self._edges_between(u, v)
+            if not self._original:
+                self._base_fingerprint = self.fingerprint()
+                self._own_weights()
+            for e in edges:
+                self._original.setdefault(e, self.weights[e])
+                self._set_weight(e, cost)
+            return self._bump(u, v)
+
+    def remove_edge(self, u: int, v: int) -> int:
+        """Cierra las aristas ``u -> v`` (peso infinito); las búsquedas las ignoran."""
+        return self.set_edge_cost(u, v, float("inf"))
+
+    def restore_edge(self, u: int, v: int) -> int:
+        """Devuelve a las aristas ``u -> v`` su peso original."""
+        with self._write_lock:
+            for e in self._edges_between(u, v):
+                original = self._original.pop(e, None)
+                if original is not None:
+                    self._set_weight(e, original)
+            return self._bump(u, v)
+
+    @property
+    def modified(self) -> bool:
+        """True si algún peso difiere del original (tras ``set_edge_cost``/``remove_edge``)."""
+        return any(self.weights[e] != w for e, w in self._original.items())
+
+    @property
+    def only_raised(self) -> bool:
+        """
+        True si ningún peso es menor que el original (solo se han subido costes o
+        cerrado aristas): las cotas inferiores calculadas sobre los pesos originales
+        siguen siendo válidas.
+        """
+        return all(self.weights[e] >= w for e, w in self._original.items())
+
+    @property
+    def base_fingerprint(self) -> str:
+        """Huella del grafo con los pesos originales, anteriores a los cambios dinámicos."""
+        return self._base_fingerprint if self._original else self.fingerprint()
+
+    def changes_since(self, version: int) -> List[Tuple[int, int]]:
+        """Aristas (u, v) modificadas después de ``version``, en orden."""
+        changes = self._changes
+        lo, hi = 0, len(changes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if changes[mid][0] <= version:
+                lo = mid + 1
+            else:
+                hi = mid
+        return [(u, v) for _, u, v in changes[lo:]]
+
+    def edge_overrides(self) -> List[Tuple[int, float]]:
+        """Pesos modificados como pares (índice de arista, peso), para replicar el estado en otro proceso."""
+        return [(e, self.weights[e]) for e in self._original]
+
+    def apply_overrides(self, overrides: Sequence[Tuple[int, float]]) -> None:
+        """Aplica pares (índice de arista, peso) obtenidos con ``edge_overrides``."""
+        if not overrides:
+            return
+        with self._write_lock:
+            if not self._original:
+                self._base_fingerprint = self.fingerprint()
+                self._own_weights()
+            for e, cost in overrides:
+                self._original.setdefault(e, self.weights[e])
+                self._set_weight(e, cost)
+            self._fingerprint = None
+            self.version = next(_VERSIONS)
+
+    def edge_cost(self, u: int, v: int) -> float:
+        """Peso actual de la arista ``u -> v`` (el menor, si hay varias)."""
+        return min(self.weights[e] for e in self._edges_between(u, v))
+
+    def _edges_between(self, u: int, v: int) -> List[int]:
+        edges = [e for e in range(self.offsets[u], self.offsets[u + 1]) if self.targets[e] == v]
+        if not edges:
+            raise ValueError(f"No existe la arista {self.names[u]!r} -> {self.names[v]!r}")
+        return edges
+
+    def _own_weights(self) -> None:
+        # Copia al escribir: las vistas de solo lectura (mmap) pasan a ser arreglos propios
+        for field in ("weights", "rev_weights"):
+            data = getattr(self, field)
+            if not isinstance(data, array):
+                owned = array(self.weight_typecode)
+                owned.frombytes(memoryview(data).cast("B"))
+                setattr(self, field, owned)
+
+    def _set_weight(self, e: int, cost: float) -> None:
+        self.weights[e] = cost
+        v = self.targets[e]
+        for k in range(self.rev_offsets[v], self.rev_offsets[v + 1]):
+            if self.rev_edge[k] == e:
+                self.rev_weights[k] = cost
+
+    def _bump(self, u: int, v: int) -> int:
+        self._fingerprint = None
+        self.version = next(_VERSIONS)
+        self._changes.append((self.version, u, v))
+        return self.version
+
+    def shortest_path_tree(self, source: int, reverse: bool = False) -> Tuple[array, array, List[int]]:
+        """
+        Dijkstra de uno a todos desde ``source``.
+
+        Args:
+            source: Nodo raíz
+            reverse: Si es True se recorren las aristas entrantes, es decir, se
+                calculan las distancias de cada nodo *hacia* ``source``
+
+        Returns:
+            (distancias, predecesores, nodos en orden de asentamiento). Los nodos
+            inalcanzables tienen distancia infinita y predecesor -1.
+        """
+        if reverse:
+            offsets, targets, weights = self.rev_offsets, self.rev_sources, self.rev_weights
+        else:
+            offsets, targets, weights = self.offsets, self.targets, self.weights
+        n = self.num_nodes
+        dist = array("d", [float("inf")]) * n
+        parent = array("i", [-1]) * n
+        done = bytearray(n)
+        order: List[int] = []
+        heap = IndexedMinHeap(n)
+        dist[source] = 0.0
+        heap.push(source, 0.0)
+        while heap:
+            d, u = heap.pop()
+            done[u] = 1
+            order.append(u)
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if not done[v] and nd < dist[v]:
+                    dist[v] = nd
+                    parent[v] = u
+                    heap.push(v, nd)
+        return dist, parent, order
+
+
+class NodeTable(Mapping):
+    """Vista de solo lectura nombre -> datos del nodo sobre un grafo compilado."""
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+
+    def __getitem__(self, name: str) -> Dict:
+        return self.graph.node_data(self.graph.index[name])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.graph.names)
+
+    def __len__(self) -> int:
+        return self.graph.num_nodes
+
+
+class EdgeTable(Mapping):
+    """Vista de solo lectura nombre -> lista de vecinos (formato de GRAPH_EDGES)."""
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+
+    def __getitem__(self, name: str) -> List[str]:
+        graph = self.graph
+        u = graph.index[name]
+        return [graph.names[graph.targets[e]] for e in range(graph.offsets[u], graph.offsets[u + 1])]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.graph.names)
+
+    def __len__(self) -> int:
+        return self.graph.num_nodes
@@ -0,0 +1,315 @@
+import heapq
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from array_store import read_arrays, write_arrays
+from compiled_graph import OFFSET_TYPECODE, TARGET_TYPECODE, CompiledGraph
+from results import RouteResult, make_result
+
+# Jerarquía precalculada del grafo de Cuenca, guardada junto a graph_data.py
+CH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cuenca.ch")
+# Nodos asentados como máximo en cada búsqueda de testigos durante la contracción
+DEFAULT_WITNESS_LIMIT = 500
+# Límite más bajo para estimar prioridades, que se recalculan muchas veces
+PRIORITY_WITNESS_LIMIT = 50
+
+INF = float("inf")
+
+# Grafo de trabajo durante la contracción: nodo -> {vecino: (peso, nodo intermedio)}
+_Adjacency = List[Dict[int, Tuple[float, int]]]
+
+
+class ContractionHierarchy:
+    """
+    Contraction Hierarchies: preprocesamiento fuera de línea y consultas punto a punto.
+
+    Los nodos se contraen uno a uno en orden de importancia; al quitar un nodo ``v``
+    se añade un atajo ``u -> x`` (con ``v`` como nodo intermedio) cuando el camino
+    ``u -> v -> x`` es el único mínimo. Una consulta es entonces un Dijkstra
+    bidireccional que solo sube de rango: hacia adelante por el grafo ``up`` y hacia
+    atrás por el grafo ``down``, ambos en formato CSR.
+    """
+
+    def __init__(self, graph: CompiledGraph, rank: array, up: Tuple[array, array, array, array],
+                 down: Tuple[array, array, array, array], fingerprint: str):
+        """
+        Args:
+            graph: Grafo original (para nombres y tamaño de los espacios de trabajo)
+            rank: Posición de cada nodo en el orden de contracción
+            up: CSR (offsets, destinos, pesos, intermedios) de las aristas ``v -> x``
+                con ``rank[x] > rank[v]``
+            down: CSR de las aristas ``u -> v`` con ``rank[u] > rank[v]``, guardadas
+                en ``v`` para recorrerlas al revés desde el destino
+            fingerprint: Huella del grafo original
+        """
+        self.graph = graph
+        self.rank = rank
+        self.up = up
+        self.down = down
+        self.fingerprint = fingerprint
+
+    @property
+    def num_shortcuts(self) -> int:
+        return sum(1 for m in self.up[3] if m >= 0) + sum(1 for m in self.down[3] if m >= 0)
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, witness_limit: int = DEFAULT_WITNESS_LIMIT) -> "ContractionHierarchy":
+        """Contrae ``graph`` y construye los grafos de búsqueda ascendentes."""
+        n = graph.num_nodes
+        out: _Adjacency = [{} for _ in range(n)]
+        inc: _Adjacency = [{} for _ in range(n)]
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        for u in range(n):
+            for e in range(offsets[u], offsets[u + 1]):
+                v, w = targets[e], weights[e]
+                if v != u and w < out[u].get(v, (INF, -1))[0]:
+                    out[u][v] = inc[v][u] = (w, -1)
+
+        deleted_neighbors = [0] * n
+
+        def witness_distances(source: int, avoid: int, bound: float, limit: int) -> Dict[int, float]:
+            # Dijkstra local sin pasar por ``avoid``; las distancias tentativas también
+            # corresponden a caminos reales, así que sirven como testigos
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            settled = 0
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if d > bound or settled >= limit:
+                    break
+                settled += 1
+                for v, (w, _) in out[u].items():
+                    nd = d + w
+                    if v != avoid and nd < dist.get(v, INF):
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+            return dist
+
+        def shortcuts(v: int, limit: int = witness_limit) -> List[Tuple[int, int, float]]:
+            result = []
+            for u, (w_in, _) in inc[v].items():
+                candidates = [(x, w_in + w_out) for x, (w_out, _) in out[v].items() if x != u]
+                if not candidates:
+                    continue
+                dist = witness_distances(u, v, max(c for _, c in candidates), limit)
+                result.extend((u, x, c) for x, c in candidates if dist.get(x, INF) > c)
+            return result
+
+        def priority(v: int) -> int:
+            # Diferencia de aristas + vecinos ya contraídos (reparte la contracción)
+            edge_difference = len(shortcuts(v, PRIORITY_WITNESS_LIMIT)) - len(inc[v]) - len(out[v])
+            return 2 * edge_difference + deleted_neighbors[v]
+
+        up_lists: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+        down_lists: List[List[Tuple[int, float, int]]] = [[] for _ in range(n)]
+        rank = array(TARGET_TYPECODE, [0]) * n
+        current = [priority(v) for v in range(n)]
+        queue = [(p, v) for v, p in enumerate(current)]
+        heapq.heapify(queue)
+        contracted = bytearray(n)
+        level = 0
+        while queue:
+            p, v = heapq.heappop(queue)
+            if contracted[v] or p != current[v]:
+                continue  # entrada obsoleta
+            # Actualización perezosa: si la prioridad empeoró, se reinserta
+            current[v] = priority(v)
+            if queue and current[v] > queue[0][0]:
+                heapq.heappush(queue, (current[v], v))
+                continue
+
+            for u, x, c in shortcuts(v):
+                if c < out[u].get(x, (INF, -1))[0]:
+                    out[u][x] = inc[x][u] = (c, v)
+            # Las aristas que quedan en v llevan a nodos que se contraerán después
+            up_lists[v] = [(x, w, mid) for x, (w, mid) in out[v].items()]
+            down_lists[v] = [(u, w, mid) for u, (w, mid) in inc[v].items()]
+            neighbors = set(out[v]) | set(inc[v])
+            for x in out[v]:
+                del inc[x][v]
+            for u in inc[v]:
+                del out[u][v]
+            out[v], inc[v] = {}, {}
+            contracted[v] = 1
+            rank[v] = level
+            level += 1
+            # Los vecinos cambian de grado: se recalcula su prioridad
+            for u in neighbors:
+                deleted_neighbors[u] += 1
+                current[u] = priority(u)
+                heapq.heappush(queue, (current[u], u))
+
+        typecode = graph.weight_typecode
+        return cls(graph, rank, _to_csr(up_lists, typecode), _to_csr(down_lists, typecode), graph.fingerprint())
+
+    def matches(self, graph: CompiledGraph) -> bool:
+        return self.fingerprint == graph.fingerprint()
+
+    def query(self, start: int, goal: int) -> Tuple[Optional[List[int]], float, List[int], List[int]]:
+        """
+        Consulta bidireccional sobre la jerarquía.
+
+        Returns:
+            (camino desempaquetado, costo, nodos asentados hacia adelante, nodos
+            asentados hacia atrás)
+        """
+        if start == goal:
+            return [start], 0.0, [start], []
+        graph = self.graph
+        sides = []
+        for slot, csr, stall_csr, source in ((0, self.up, self.down, start), (1, self.down, self.up, goal)):
+            ws = graph.workspace(slot)
+            gen = ws.begin()
+            ws.stamp[source] = gen
+            ws.g[source] = 0.0
+            ws.parent[source] = -1
+            ws.heap.push(source, 0.0)
+            sides.append((ws, gen, csr, stall_csr, []))
+
+        best, meet = INF, -1
+        while True:
+            # Cada dirección se detiene cuando su mínimo alcanza el mejor costo
+            active = [i for i in (0, 1) if sides[i][0].heap and sides[i][0].heap.peek_key() < best]
+            if not active:
+                break
+            i = min(active, key=lambda k: sides[k][0].heap.peek_key())
+            ws, gen, (offsets, targets, weights, _), stall_csr, explored = sides[i]
+            other_ws, other_gen = sides[1 - i][0], sides[1 - i][1]
+            stamp, g, parent = ws.stamp, ws.g, ws.parent
+
+            g_score, current = ws.heap.pop()
+            ws.closed[current] = gen
+            explored.append(current)
+            if other_ws.stamp[current] == other_gen and g_score + other_ws.g[current] < best:
+                best, meet = g_score + other_ws.g[current], current
+            if self._stalled(current, g_score, ws, gen, stall_csr):
+                continue
+
+            for e in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[e]
+                new_g = g_score + weights[e]
+                if stamp[neighbor] == gen and new_g >= g[neighbor]:
+                    continue
+                stamp[neighbor] = gen
+                g[neighbor] = new_g
+                parent[neighbor] = current
+                ws.heap.push(neighbor, new_g)
+
+        forward, backward = sides[0][4], sides[1][4]
+        if meet < 0:
+            return None, INF, forward, backward
+        fw, bw = sides[0][0], sides[1][0]
+        hops = fw.path_to(meet)
+        node = bw.parent[meet]
+        while node >= 0:
+            hops.append(node)
+            node = bw.parent[node]
+        return self.unpack(hops), best, forward, backward
+
+    @staticmethod
+    def _stalled(node: int, g_score: float, ws, gen: int, stall_csr) -> bool:
+        # Stall-on-demand: si un nodo de rango mayor ya alcanzado llega a ``node``
+        # por una arista más barata, su distancia no es óptima y no se expande
+        offsets, targets, weights, _ = stall_csr
+        stamp, g = ws.stamp, ws.g
+        for e in range(offsets[node], offsets[node + 1]):
+            higher = targets[e]
+            if stamp[higher] == gen and g[higher] + weights[e] < g_score:
+                return True
+        return False
+
+    def find_path(self, start: str, goal: str) -> RouteResult:
+        """Misma interfaz que ``AStarPathFinder.find_path``."""
+        graph = self.graph
+        return make_result(graph, *self.query(graph.id_of(start), graph.id_of(goal)))
+
+    def _middle(self, u: int, v: int) -> int:
+        # Nodo intermedio de la arista u -> v en la jerarquía (-1 si es original)
+        if self.rank[u] < self.rank[v]:
+            offsets, targets, _, middle = self.up
+            source, other = u, v
+        else:
+            offsets, targets, _, middle = self.down
+            source, other = v, u
+        for e in range(offsets[source], offsets[source + 1]):
+            if targets[e] == other:
+                return middle[e]
+        raise KeyError((u, v))
+
+    def unpack(self, hops: List[int]) -> List[int]:
+        """Reemplaza cada atajo del camino por la secuencia de nodos originales."""
+        path = [hops[0]]
+        stack = [(u, v) for u, v in zip(reversed(hops[:-1]), reversed(hops[1:]))]
+        while stack:
+            u, v = stack.pop()
+            mid = self._middle(u, v)
+            if mid < 0:
+                path.append(v)
+            else:
+                stack.append((mid, v))
+                stack.append((u, mid))
+        return path
+
+    def save(self, path: str) -> None:
+        arrays = {"rank": self.rank}
+        for prefix, csr in (("up", self.up), ("down", self.down)):
+            for suffix, data in zip(("offsets", "targets", "weights", "middle"), csr):
+                arrays[f"{prefix}_{suffix}"] = data
+        write_arrays(path, {"kind": "contraction_hierarchy", "fingerprint": self.fingerprint}, arrays)
+
+    @classmethod
+    def load(cls, path: str, graph: CompiledGraph) -> "ContractionHierarchy":
+        meta, arrays = read_arrays(path)
+        if meta.get("kind") != "contraction_hierarchy":
+            raise ValueError(f"{path} no contiene una jerarquía de contracción")
+        csr = {prefix: tuple(arrays[f"{prefix}_{suffix}"] for suffix in ("offsets", "targets", "weights", "middle"))
+               for prefix in ("up", "down")}
+        return cls(graph, arrays["rank"], csr["up"], csr["down"], meta["fingerprint"])
+
+
+def _to_csr(lists: List[List[Tuple[int, float, int]]], weight_typecode: str) -> Tuple[array, array, array, array]:
+    offsets = array(OFFSET_TYPECODE, [0])
+    targets = array(TARGET_TYPECODE)
+    weights = array(weight_typecode)
+    middle = array(TARGET_TYPECODE)
+    for adjacency in lists:
+        for v, w, mid in adjacency:
+            targets.append(v)
+            weights.append(w)
+            middle.append(mid)
+        offsets.append(len(targets))
+    return offsets, targets, weights, middle
+
+
+def load_or_build(graph: CompiledGraph, path: str) -> ContractionHierarchy:
+    """
+    Carga la jerarquía de ``path`` si corresponde al grafo; si no, la construye y
+    la guarda en ``path`` para no repetir el preprocesamiento en cada arranque.
+    """
+    if os.path.exists(path):
+        hierarchy = ContractionHierarchy.load(path, graph)
+        if hierarchy.matches(graph):
+            return hierarchy
+    hierarchy = ContractionHierarchy.build(graph)
+    try:
+        hierarchy.save(path)
+    except OSError:
+        # Sin permiso de escritura la jerarquía se usa igualmente desde memoria
+        pass
+    return hierarchy
+
+
+if __name__ == "__main__":
+    # Preprocesamiento fuera de línea: python contraction.py
+    import time
+    from graph_data import CUENCA_NODES, GRAPH_EDGES
+
+    graph = CompiledGraph(CUENCA_NODES, GRAPH_EDGES)
+    t0 = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(graph)
+    hierarchy.save(CH_PATH)
+    print(f"{graph.num_nodes} nodos, {hierarchy.num_shortcuts} atajos, "
+          f"{time.perf_counter() - t0:.2f} s -> {CH_PATH}")
@@ -0,0 +1,89 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from array_store import read_header, write_arrays
+from compiled_graph import CompiledGraph
+
+# Tabla de distancias del grafo de Cuenca, guardada junto a graph_data.py
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cuenca.dist")
+
+
+class DistanceTable:
+    """
+    Matrices densas de distancias mínimas y de siguiente salto entre todos los pares.
+
+    ``dist[i, j]`` es la distancia mínima de ``i`` a ``j`` (infinita si no hay
+    camino) y ``next_hop[i, j]`` el primer nodo después de ``i`` en ese camino
+    (-1 si no hay camino). Pensada para grafos de pocos miles de nodos: las
+    consultas se responden por búsqueda en tabla, sin expandir nodos.
+    """
+
+    def __init__(self, dist: np.ndarray, next_hop: np.ndarray, fingerprint: str):
+        self.dist = dist
+        self.next_hop = next_hop
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, graph: CompiledGraph) -> "DistanceTable":
+        """Ejecuta Dijkstra de uno a todos desde cada nodo."""
+        n = graph.num_nodes
+        dist = np.full((n, n), np.inf, dtype=np.float64)
+        next_hop = np.full((n, n), -1, dtype=np.int32)
+        for source in range(n):
+            row_dist, parent, order = graph.shortest_path_tree(source)
+            row_hop = [-1] * n
+            row_hop[source] = source
+            # En orden de asentamiento el predecesor de cada nodo ya tiene su salto
+            for v in order[1:]:
+                p = parent[v]
+                row_hop[v] = v if p == source else row_hop[p]
+            dist[source] = row_dist
+            next_hop[source] = row_hop
+        return cls(dist, next_hop, graph.fingerprint())
+
+    def matches(self, graph: CompiledGraph) -> bool:
+        return self.fingerprint == graph.fingerprint()
+
+    def route(self, start: int, goal: int) -> Tuple[Optional[List[int]], float]:
+        """Reconstruye el camino recorriendo la matriz de siguiente salto."""
+        cost = float(self.dist[start, goal])
+        if cost == float("inf"):
+            return None, cost
+        next_hop = self.next_hop
+        path = [start]
+        while path[-1] != goal:
+            path.append(int(next_hop[path[-1], goal]))
+        return path, cost
+
+    def save(self, path: str) -> None:
+        write_arrays(path, {"kind": "distance_table", "fingerprint": self.fingerprint,
+                            "num_nodes": len(self.dist)},
+                     {"dist": self.dist.reshape(-1), "next_hop": self.next_hop.reshape(-1)})
+
+    @classmethod
+    def load(cls, path: str) -> "DistanceTable":
+        """
+        Abre la tabla con ``np.memmap``: no se copia nada a memoria y varios procesos
+        que abran el mismo archivo comparten las páginas del sistema operativo.
+        """
+        meta, entries = read_header(path)
+        if meta.get("kind") != "distance_table":
+            raise ValueError(f"{path} no contiene una tabla de distancias")
+        n = meta["num_nodes"]
+        matrices = {entry["name"]: np.memmap(path, dtype=np.dtype(entry["typecode"]), mode="r",
+                                             offset=entry["offset"], shape=(n, n))
+                    for entry in entries}
+        return cls(matrices["dist"], matrices["next_hop"], meta["fingerprint"])
+
+
+if __name__ == "__main__":
+    # Paso de construcción: python distance_table.py
+    import time
+    from graph_data import CUENCA_NODES, GRAPH_EDGES
+
+    graph = CompiledGraph(CUENCA_NODES, GRAPH_EDGES)
+    t0 = time.perf_counter()
+    DistanceTable.build(graph).save(TABLE_PATH)
+    print(f"{graph.num_nodes} nodos, {time.perf_counter() - t0:.2f} s -> {TABLE_PATH}")
@@ -48,6 +48,9 @@ GRAPH_EDGES = {
     "Escalinata": ["Puente Roto", "Museo de la Ciudad", "Museo Remigio Crespo Toral"],
 }
 
+# Minutos por kilómetro a pie (velocidad de 5 km/h)
+WALKING_MINUTES_PER_KM = 12.0
+
 # Función de distancia Haversine (más precisa para coordenadas geográficas)
 def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
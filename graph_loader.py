@@ -0,0 +1,299 @@
+import csv
+import hashlib
+import json
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from array_store import pack_strings, read_arrays, read_header, unpack_strings, write_arrays
+from compiled_graph import CompiledGraph
+
+# Instantánea binaria del grafo por defecto, guardada junto a graph_data.py
+SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cuenca.graph")
+SNAPSHOT_VERSION = 1
+BUILTIN_DATASETS = ("cuenca",)
+CHUNK_SIZE = 1 << 16
+
+Nodes = Dict[str, Dict]
+Edges = Dict[str, List[str]]
+Source = Union[str, Tuple[str, str]]
+
+
+def _builtin(name: str) -> Tuple[Nodes, Edges]:
+    # Los diccionarios de graph_data son solo uno de los conjuntos de datos
+    from graph_data import CUENCA_NODES, GRAPH_EDGES
+    return CUENCA_NODES, GRAPH_EDGES
+
+
+# ============= LECTORES EN STREAMING =============
+
+def read_csv(nodes_path: str, edges_path: str) -> Tuple[Nodes, Edges]:
+    """
+    Lee nodos y aristas de dos archivos CSV, fila por fila.
+
+    ``nodes_path`` tiene las columnas ``name, lat, lon`` y opcionalmente
+    ``descripcion, tiempo``; ``edges_path`` tiene ``source, target`` y cada fila es
+    una arista dirigida, igual que las listas de GRAPH_EDGES.
+    """
+    nodes: Nodes = {}
+    edges: Edges = {}
+    with open(nodes_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            _add_node(nodes, row["name"], row["lat"], row["lon"], row.get("descripcion"), row.get("tiempo"))
+    with open(edges_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            edges.setdefault(row["source"], []).append(row["target"])
+    return nodes, edges
+
+
+def read_geojson(path: str) -> Tuple[Nodes, Edges]:
+    """
+    Lee una FeatureCollection GeoJSON procesando las features una a una, sin cargar
+    el documento completo.
+
+    Las features ``Point`` son nodos (propiedades ``name``, ``descripcion`` y
+    ``tiempo``); las ``LineString`` con propiedades ``source`` y ``target`` son
+    aristas dirigidas.
+    """
+    nodes: Nodes = {}
+    edges: Edges = {}
+    with open(path, encoding="utf-8") as f:
+        for feature in _iter_features(f):
+            geometry = feature.get("geometry") or {}
+            properties = feature.get("properties") or {}
+            if geometry.get("type") == "Point":
+                lon, lat = geometry["coordinates"][:2]
+                name = properties.get("name", feature.get("id"))
+                if name is None:
+                    raise ValueError(f"{path}: hay un punto sin propiedad 'name'")
+                _add_node(nodes, str(name), lat, lon, properties.get("descripcion"), properties.get("tiempo"))
+            elif geometry.get("type") == "LineString" and "source" in properties and "target" in properties:
+                edges.setdefault(str(properties["source"]), []).append(str(properties["target"]))
+    return nodes, edges
+
+
+def read_osm(path: str, keep_isolated: bool = False) -> Tuple[Nodes, Edges]:
+    """
+    Lee un extracto OSM XML con ``iterparse``, liberando cada elemento al procesarlo.
+
+    Cada ``way`` con etiqueta ``highway`` aporta aristas entre nodos consecutivos en
+    ambos sentidos, salvo que tenga ``oneway=yes`` (o ``-1``, sentido contrario).
+    Los nodos se identifican por su id OSM y su nombre, si lo tienen, va en
+    ``descripcion``.
+
+    Args:
+        path: Archivo .osm
+        keep_isolated: Si es False se descartan los nodos que no pertenecen a ninguna vía
+    """
+    nodes: Nodes = {}
+    edges: Edges = {}
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end":
+            continue
+        if elem.tag == "node":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            _add_node(nodes, elem.get("id"), elem.get("lat"), elem.get("lon"), tags.get("name"), None)
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            if "highway" in tags:
+                refs = [nd.get("ref") for nd in elem.iter("nd")]
+                oneway = tags.get("oneway", "no")
+                if oneway == "-1":
+                    refs.reverse()
+                for a, b in zip(refs, refs[1:]):
+                    edges.setdefault(a, []).append(b)
+                    if oneway not in ("yes", "true", "1", "-1"):
+                        edges.setdefault(b, []).append(a)
+        else:
+            continue
+        # Libera la memoria del elemento ya procesado
+        elem.clear()
+        root.clear()
+    if not keep_isolated:
+        used = set(edges)
+        for neighbors in edges.values():
+            used.update(neighbors)
+        nodes = {name: data for name, data in nodes.items() if name in used}
+    return nodes, edges
+
+
+def _add_node(nodes: Nodes, name: str, lat, lon, descripcion: Optional[str], tiempo) -> None:
+    if name in nodes:
+        raise ValueError(f"Nodo duplicado: {name!r}")
+    nodes[name] = {
+        "lat": float(lat),
+        "lon": float(lon),
+        "descripcion": descripcion or "",
+        "tiempo": int(float(tiempo)) if tiempo not in (None, "") else 0,
+    }
+
+
+def _iter_features(f: TextIO) -> Iterator[Dict]:
+    # Analizador incremental mínimo: recorre las claves del objeto raíz y, al llegar
+    # a "features", decodifica los elementos del arreglo de uno en uno
+    reader = _JsonStream(f)
+    reader.expect("{")
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == "features":
+            reader.expect("[")
+            while reader.peek() != "]":
+                yield reader.value()
+                if reader.peek() == ",":
+                    reader.expect(",")
+            reader.expect("]")
+        else:
+            reader.value()
+        if reader.peek() == ",":
+            reader.expect(",")
+
+
+class _JsonStream:
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido: se esperaba {char!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Un número al final del búfer podría continuar en el siguiente bloque
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+
+# ============= VALIDACIÓN Y CARGA =============
+
+def validate(nodes: Nodes, edges: Edges) -> None:
+    """Comprueba que los dos extremos de cada arista existan en la tabla de nodos."""
+    missing = [(u, v) for u, neighbors in edges.items() for v in neighbors
+               if u not in nodes or v not in nodes]
+    if missing:
+        examples = ", ".join(f"{u!r} -> {v!r}" for u, v in missing[:5])
+        raise ValueError(f"{len(missing)} aristas con extremos inexistentes (p. ej. {examples})")
+
+
+def load_dataset(source: Source) -> Tuple[Nodes, Edges]:
+    """
+    Carga y valida un conjunto de datos con el esquema de graph_data.
+
+    Args:
+        source: Nombre de un conjunto incorporado (``"cuenca"``), un archivo
+            ``.geojson``/``.json`` u ``.osm``, un directorio con ``nodes.csv`` y
+            ``edges.csv``, o una tupla (csv de nodos, csv de aristas)
+    """
+    if isinstance(source, tuple):
+        nodes, edges = read_csv(*source)
+    elif source in BUILTIN_DATASETS:
+        nodes, edges = _builtin(source)
+    elif os.path.isdir(source):
+        nodes, edges = read_csv(os.path.join(source, "nodes.csv"), os.path.join(source, "edges.csv"))
+    elif source.endswith((".geojson", ".json")):
+        nodes, edges = read_geojson(source)
+    elif source.endswith((".osm", ".xml")):
+        nodes, edges = read_osm(source)
+    else:
+        raise ValueError(f"Formato de grafo no reconocido: {source!r}")
+    validate(nodes, edges)
+    return nodes, edges
+
+
+def _source_key(source: Source) -> str:
+    # Identifica la versión de los datos de origen para saber si la instantánea sirve
+    if not isinstance(source, tuple) and source in BUILTIN_DATASETS:
+        payload = json.dumps(_builtin(source), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return f"builtin:{source}:{hashlib.sha1(payload).hexdigest()}"
+    paths = list(source) if isinstance(source, tuple) else [source]
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        paths = [os.path.join(paths[0], "nodes.csv"), os.path.join(paths[0], "edges.csv")]
+    stats = [os.stat(p) for p in paths]
+    return "|".join(f"{os.path.abspath(p)}:{st.st_size}:{st.st_mtime_ns}" for p, st in zip(paths, stats))
+
+
+def save_snapshot(graph: CompiledGraph, path: str, source_key: str = "") -> None:
+    """Guarda el grafo compilado (arreglos + tabla de cadenas) en una instantánea binaria."""
+    names_blob, names_offsets = pack_strings(graph.names)
+    desc_blob, desc_offsets = pack_strings(graph.descriptions)
+    arrays = {
+        "names_blob": names_blob, "names_offsets": names_offsets,
+        "desc_blob": desc_blob, "desc_offsets": desc_offsets,
+    }
+    for field in ("lat", "lon", "visit_times", "offsets", "targets", "weights",
+                  "rev_offsets", "rev_sources", "rev_edge", "rev_weights"):
+        arrays[field] = getattr(graph, field)
+    write_arrays(path, {
+        "kind": "graph_snapshot",
+        "snapshot_version": SNAPSHOT_VERSION,
+        "source_key": source_key,
+        "fingerprint": graph.fingerprint(),
+    }, arrays)
+
+
+def load_snapshot(path: str) -> CompiledGraph:
+    """Abre una instantánea con mmap: los arreglos no se copian ni se recalculan."""
+    meta, arrays = read_arrays(path, use_mmap=True)
+    if meta.get("kind") != "graph_snapshot" or meta.get("snapshot_version") != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} no es una instantánea de grafo compatible")
+    names = unpack_strings(arrays["names_blob"], arrays["names_offsets"])
+    descriptions = unpack_strings(arrays["desc_blob"], arrays["desc_offsets"])
+    return CompiledGraph.from_arrays(names, arrays, descriptions, snapshot_path=path)
+
+
+def load_graph(source: Source = "cuenca", snapshot_path: Optional[str] = None) -> CompiledGraph:
+    """
+    Devuelve el grafo compilado de ``source``.
+
+    Si ``snapshot_path`` existe y fue generado a partir de los mismos datos, se
+    carga directamente por mmap; si no, se leen los datos de origen, se compila el
+    grafo y se escribe la instantánea para los siguientes arranques.
+    """
+    key = _source_key(source)
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            meta, _ = read_header(snapshot_path)
+        except ValueError:
+            meta = {}
+        if meta.get("source_key") == key and meta.get("snapshot_version") == SNAPSHOT_VERSION:
+            return load_snapshot(snapshot_path)
+
+    graph = CompiledGraph(*load_dataset(source))
+    if snapshot_path:
+        try:
+            save_snapshot(graph, snapshot_path, key)
+        except OSError:
+            # Sin permiso de escritura se sigue con el grafo en memoria
+            pass
+    return graph
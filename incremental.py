@@ -0,0 +1,200 @@
+import heapq
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from compiled_graph import CompiledGraph
+from graph_data import haversine_distance
+from results import RouteResult, make_result
+
+INF = float("inf")
+
+
+class LPAStar:
+    """
+    Lifelong Planning A* entre un origen y un destino fijos.
+
+    Guarda entre consultas los valores ``g`` (distancia conocida) y ``rhs``
+    (distancia según los predecesores) de los nodos que ha tocado. Cuando cambian
+    pesos del grafo solo se recalculan los nodos afectados por el cambio, en vez
+    de repetir la búsqueda completa.
+
+    La heurística es la distancia Haversine al destino, consistente mientras
+    ningún peso sea menor que la distancia en línea recta entre sus extremos
+    (las aristas cerradas tienen peso infinito, así que siempre lo cumplen).
+    """
+
+    def __init__(self, graph: CompiledGraph, start: int, goal: int):
+        self.graph = graph
+        self.start = start
+        self.goal = goal
+        self.g: Dict[int, float] = {}
+        self.rhs: Dict[int, float] = {start: 0.0}
+        self._queue: List[Tuple[float, float, int]] = []
+        self._queued: Dict[int, Tuple[float, float]] = {}
+        self.version = graph.version
+        lat, lon = graph.lat, graph.lon
+        goal_lat, goal_lon = lat[goal], lon[goal]
+        self._h: Dict[int, float] = {}
+        self._heuristic = lambda v: haversine_distance(lat[v], lon[v], goal_lat, goal_lon)
+        self._push(start)
+
+    def _key(self, v: int) -> Tuple[float, float]:
+        best = min(self.g.get(v, INF), self.rhs.get(v, INF))
+        h = self._h.get(v)
+        if h is None:
+            h = self._h[v] = self._heuristic(v)
+        return best + h, best
+
+    def _push(self, v: int) -> None:
+        key = self._key(v)
+        self._queued[v] = key
+        heapq.heappush(self._queue, (key[0], key[1], v))
+
+    def _top_key(self) -> Tuple[float, float]:
+        # Las entradas cuya clave ya no coincide con la vigente se descartan aquí
+        queue, queued = self._queue, self._queued
+        while queue and queued.get(queue[0][2]) != queue[0][:2]:
+            heapq.heappop(queue)
+        return queue[0][:2] if queue else (INF, INF)
+
+    def _update_vertex(self, v: int) -> None:
+        graph = self.graph
+        if v != self.start:
+            g, best = self.g, INF
+            rev_sources, rev_weights = graph.rev_sources, graph.rev_weights
+            for k in range(graph.rev_offsets[v], graph.rev_offsets[v + 1]):
+                candidate = g.get(rev_sources[k], INF) + rev_weights[k]
+                if candidate < best:
+                    best = candidate
+            if best == INF:
+                self.rhs.pop(v, None)
+            else:
+                self.rhs[v] = best
+        self._queued.pop(v, None)
+        if self.g.get(v, INF) != self.rhs.get(v, INF):
+            self._push(v)
+
+    def compute(self) -> List[int]:
+        """Repara los valores hasta que el destino es consistente; devuelve los nodos expandidos."""
+        graph = self.graph
+        offsets, targets = graph.offsets, graph.targets
+        g, rhs, goal = self.g, self.rhs, self.goal
+        expanded: List[int] = []
+        while True:
+            top = self._top_key()
+            if not (top < self._key(goal) or rhs.get(goal, INF) != g.get(goal, INF)):
+                break
+            if top == (INF, INF):
+                break
+            _, _, u = heapq.heappop(self._queue)
+            del self._queued[u]
+            expanded.append(u)
+            if g.get(u, INF) > rhs.get(u, INF):
+                # Sobreconsistente: el nodo mejora y propaga a sus sucesores
+                g[u] = rhs[u]
+                for e in range(offsets[u], offsets[u + 1]):
+                    self._update_vertex(targets[e])
+            else:
+                # Subconsistente: su distancia empeoró; se recalcula él y sus sucesores
+                g.pop(u, None)
+                self._update_vertex(u)
+                for e in range(offsets[u], offsets[u + 1]):
+                    self._update_vertex(targets[e])
+        return expanded
+
+    def update(self) -> List[int]:
+        """Incorpora los cambios de pesos posteriores a la última consulta y repara la ruta."""
+        graph = self.graph
+        for _, v in graph.changes_since(self.version):
+            self._update_vertex(v)
+        self.version = graph.version
+        return self.compute()
+
+    def path(self) -> Tuple[Optional[List[int]], float]:
+        """Ruta actual reconstruida hacia atrás desde el destino por el mejor predecesor."""
+        graph = self.graph
+        g, goal = self.g, self.goal
+        cost = g.get(goal, INF)
+        if cost == INF:
+            return None, INF
+        path = [goal]
+        while path[-1] != self.start:
+            v = path[-1]
+            best, best_u = INF, -1
+            for k in range(graph.rev_offsets[v], graph.rev_offsets[v + 1]):
+                candidate = g.get(graph.rev_sources[k], INF) + graph.rev_weights[k]
+                if candidate < best:
+                    best, best_u = candidate, graph.rev_sources[k]
+            if best_u < 0 or len(path) > graph.num_nodes:
+                return None, INF
+            path.append(best_u)
+        path.reverse()
+        return path, cost
+
+
+class RouteManager:
+    """
+    Rutas activas que se mantienen al día cuando cambian pesos del grafo.
+
+    Cada ruta tiene su propio ``LPAStar``. Tras un cierre o un cambio de coste,
+    ``replan`` repara todas las rutas; las que no pasan cerca de la arista
+    modificada terminan casi sin expandir nodos.
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        self.graph = graph
+        self._planners: Dict[Hashable, LPAStar] = {}
+        self._results: Dict[Hashable, RouteResult] = {}
+        self._lock = threading.Lock()
+
+    def track(self, start: str, goal: str, key: Optional[Hashable] = None) -> RouteResult:
+        """
+        Empieza a seguir la ruta ``start -> goal`` y devuelve su resultado inicial.
+
+        Args:
+            start, goal: Nombres de los nodos
+            key: Identificador de la ruta (por defecto, el par (start, goal))
+        """
+        key = key if key is not None else (start, goal)
+        graph = self.graph
+        planner = LPAStar(graph, graph.id_of(start), graph.id_of(goal))
+        with self._lock:
+            result = self._solve(planner, planner.compute())
+            self._planners[key] = planner
+            self._results[key] = result
+        return result
+
+    def untrack(self, key: Hashable) -> None:
+        with self._lock:
+            self._planners.pop(key, None)
+            self._results.pop(key, None)
+
+    def route(self, key: Hashable) -> RouteResult:
+        """Último resultado de la ruta ``key`` (sin replanificar)."""
+        with self._lock:
+            return self._results[key]
+
+    def replan(self) -> Dict[Hashable, RouteResult]:
+        """
+        Repara todas las rutas tras los cambios del grafo.
+
+        Returns:
+            Las rutas cuyo camino o costo cambió, con su nuevo resultado; los nodos
+            explorados de cada resultado son los expandidos en la reparación
+        """
+        changed: Dict[Hashable, RouteResult] = {}
+        with self._lock:
+            for key, planner in self._planners.items():
+                if planner.version == self.graph.version:
+                    continue
+                result = self._solve(planner, planner.update())
+                previous = self._results[key]
+                self._results[key] = result
+                if result.path != previous.path or result.cost != previous.cost:
+                    changed[key] = result
+        return changed
+
+    def _solve(self, planner: LPAStar, expanded: List[int]) -> RouteResult:
+        path, cost = planner.path()
+        arrivals = [planner.g[v] for v in path] if path is not None else None
+        return make_result(self.graph, path, cost, expanded, [], arrivals=arrivals)
@@ -0,0 +1,405 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Cotas superiores de los cubos de cada histograma (el último cubo, +Inf, es implícito)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+EXPANDED_BUCKETS = (10, 30, 100, 300, 1000, 3000, 10000, 30000, 100000)
+BRANCHING_BUCKETS = (0.5, 1.0, 1.05, 1.1, 1.25, 1.5, 2.0, 3.0, 5.0)
+# Fases de una consulta de find_path, en orden
+PHASES = ("snap", "prepare", "search", "result")
+# Prefijo de las métricas exportadas en formato Prometheus
+METRIC_PREFIX = "astar"
+# Consultas recientes que guarda el perfilador
+RECENT_QUERIES = 100
+
+# Contadores acumulados por serie: (nombre, ayuda)
+COUNTERS = (
+    ("queries", "Consultas resueltas"),
+    ("found", "Consultas con ruta"),
+    ("expanded", "Nodos expandidos"),
+    ("heap_pushes", "Inserciones o decrease-key en la cola de prioridad"),
+    ("heap_pops", "Extracciones de la cola de prioridad"),
+    ("heap_stale", "Decrease-key en la cola (entradas obsoletas que dejaría heapq)"),
+    ("heuristic_calls", "Evaluaciones de la heurística"),
+    ("distance_calls", "Evaluaciones de distancia geográfica"),
+)
+
+
+@dataclass(frozen=True)
+class QueryProfile:
+    """
+    Medidas de una consulta de ``find_path`` con la instrumentación activa.
+
+    ``heap_stale`` cuenta los decrease-key de la cola: con ``heapq`` cada uno
+    sería una inserción duplicada que dejaría una entrada obsoleta que saltar al
+    extraer. ``distance_calls`` son las distancias geográficas calculadas por la
+    heurística; ALT consulta su tabla y no calcula ninguna. ``phases`` da los
+    segundos de cada fase de ``PHASES`` y ``branching_factor`` el factor de
+    ramificación efectivo (NaN sin ruta).
+    """
+    mode: str
+    heuristic: str
+    found: bool
+    expanded: int
+    depth: int
+    heap_pushes: int
+    heap_pops: int
+    heap_stale: int
+    heuristic_calls: int
+    distance_calls: int
+    phases: Dict[str, float]
+    branching_factor: float
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.phases.values())
+
+
+def effective_branching_factor(expanded: int, depth: int) -> float:
+    """
+    Factor de ramificación efectivo b*: el de un árbol uniforme de profundidad
+    ``depth`` con ``expanded + 1`` nodos, es decir, la raíz de
+    ``1 + b + b² + ... + b^depth = expanded + 1``. Cuanto más cerca de 1, mejor
+    guía la heurística la búsqueda.
+
+    Returns:
+        b* (por bisección), o NaN si no hay profundidad
+    """
+    if depth <= 0 or expanded <= 0:
+        return float("nan")
+    # Se compara en escala logarítmica: b^(depth + 1) desborda con rutas largas
+    log_target = math.log(expanded + 1)
+
+    def log_nodes(b: float) -> float:
+        if b == 1.0:
+            return math.log(depth + 1)
+        if b > 1.0:
+            return (depth + 1) * math.log(b) + math.log1p(-b ** -(depth + 1)) - math.log(b - 1)
+        return math.log1p(-b ** (depth + 1)) - math.log1p(-b)
+
+    # b^depth <= nodos del árbol, así que b* <= (expanded + 1)^(1 / depth)
+    lo, hi = 0.0, math.exp(log_target / depth) + 1.0
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if log_nodes(mid) < log_target:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo < 1e-9:
+            break
+    return (lo + hi) / 2
+
+
+class Histogram:
+    """Histograma de cubos fijos, acumulable y exportable como el de Prometheus."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if math.isnan(value):
+            return
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Pares (cota superior, observaciones menores o iguales), terminando en +Inf."""
+        total, out = 0, []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q: float) -> float:
+        """Cota superior del cubo donde cae el cuantil ``q`` (aproximación por cubos)."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != float("inf") else self.bounds[-1]
+        return self.bounds[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else float("nan")
+
+    def as_dict(self) -> Dict:
+        return {"bounds": list(self.bounds), "counts": list(self.counts),
+                "sum": self.sum, "count": self.count}
+
+
+class QueryTrace:
+    """
+    Contadores de la consulta en curso de un hilo.
+
+    Se crea con ``Profiler.begin`` y se cierra con ``Profiler.finish``; mientras
+    tanto el buscador marca el final de cada fase con ``lap`` y envuelve sus
+    heurísticas con ``count``.
+    """
+    __slots__ = ("heuristic_calls", "distance_calls", "phases", "_last", "_heap")
+
+    def __init__(self, heap_operations: Tuple[int, int, int]):
+        self.heuristic_calls = 0
+        self.distance_calls = 0
+        self.phases: Dict[str, float] = {}
+        self._heap = heap_operations
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def count(self, potential: Callable[[int], float], distance: bool) -> Callable[[int], float]:
+        """Envuelve una heurística para contar sus llamadas (y las distancias si ``distance``)."""
+        def counted(v: int) -> float:
+            self.heuristic_calls += 1
+            if distance:
+                self.distance_calls += 1
+            return potential(v)
+        return counted
+
+
+class _Series:
+    # Agregados de una combinación (modo, heurística)
+    def __init__(self):
+        self.counters = {name: 0 for name, _ in COUNTERS}
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.expanded = Histogram(EXPANDED_BUCKETS)
+        self.branching = Histogram(BRANCHING_BUCKETS)
+
+    def add(self, profile: QueryProfile) -> None:
+        counters = self.counters
+        counters["queries"] += 1
+        counters["found"] += profile.found
+        for name in ("expanded", "heap_pushes", "heap_pops", "heap_stale",
+                     "heuristic_calls", "distance_calls"):
+            counters[name] += getattr(profile, name)
+        for phase, seconds in profile.phases.items():
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        self.latency.observe(profile.seconds)
+        self.expanded.observe(profile.expanded)
+        self.branching.observe(profile.branching_factor)
+
+
+class Profiler:
+    """
+    Instrumentación opcional de ``AStarPathFinder``.
+
+    Se activa asignándolo al buscador (``pathfinder.profiler = Profiler()``); sin
+    perfilador, cada consulta solo paga unas comparaciones con None. Con él, cada
+    ``RouteResult`` lleva su ``QueryProfile`` y aquí se acumulan contadores e
+    histogramas por (modo, heurística), exportables en el formato de texto de
+    Prometheus o en JSON. Las funciones de ``hooks`` reciben cada perfil al
+    terminar la consulta (por ejemplo, para enviarlo a otro sistema).
+
+    Es seguro entre hilos: la consulta en curso se guarda por hilo y los
+    agregados se actualizan bajo un candado. Las consultas resueltas en procesos
+    hijos (``find_paths`` con ``executor="process"``) no se registran.
+    """
+
+    def __init__(self, hooks: Iterable[Callable[[QueryProfile], None]] = (),
+                 recent: int = RECENT_QUERIES):
+        self.hooks: List[Callable[[QueryProfile], None]] = list(hooks)
+        self.recent: Deque[QueryProfile] = deque(maxlen=recent)
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ============= CONSULTAS =============
+
+    def begin(self, heap_operations: Tuple[int, int, int]) -> QueryTrace:
+        """Abre la traza de una consulta en el hilo actual."""
+        trace = self._local.trace = QueryTrace(heap_operations)
+        return trace
+
+    def current(self) -> Optional[QueryTrace]:
+        """Traza abierta en el hilo actual, o None."""
+        return getattr(self._local, "trace", None)
+
+    def finish(self, trace: QueryTrace, heap_operations: Tuple[int, int, int], mode: str,
+               heuristic: str, expanded: int, path_length: Optional[int]) -> QueryProfile:
+        """
+        Cierra la traza, registra la consulta y devuelve su perfil.
+
+        Args:
+            heap_operations: Lectura de ``CompiledGraph.heap_operations`` al terminar
+            expanded: Nodos expandidos
+            path_length: Nodos de la ruta encontrada, o None si no hay ruta
+        """
+        self._local.trace = None
+        pushes, pops, stale = (b - a for a, b in zip(trace._heap, heap_operations))
+        depth = path_length - 1 if path_length else 0
+        profile = QueryProfile(
+            mode=mode,
+            heuristic=heuristic,
+            found=path_length is not None,
+            expanded=expanded,
+            depth=depth,
+            heap_pushes=pushes,
+            heap_pops=pops,
+            heap_stale=stale,
+            heuristic_calls=trace.heuristic_calls,
+            distance_calls=trace.distance_calls,
+            phases=dict(trace.phases),
+            branching_factor=effective_branching_factor(expanded, depth),
+        )
+        self.record(profile)
+        return profile
+
+    def record(self, profile: QueryProfile) -> None:
+        """Añade un perfil a los agregados y lo pasa a los ``hooks``."""
+        with self._lock:
+            series = self._series.get((profile.mode, profile.heuristic))
+            if series is None:
+                series = self._series[(profile.mode, profile.heuristic)] = _Series()
+            series.add(profile)
+            self.recent.append(profile)
+        for hook in self.hooks:
+            hook(profile)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self.recent.clear()
+
+    # ============= AGREGADOS =============
+
+    def summary(self) -> Dict:
+        """
+        Resumen de todas las consultas registradas.
+
+        Returns:
+            Diccionario con el total de consultas, latencia media y cuantiles
+            aproximados (ms), medias por consulta de los contadores y segundos
+            acumulados por fase
+        """
+        with self._lock:
+            queries = sum(s.counters["queries"] for s in self._series.values())
+            latency = Histogram(LATENCY_BUCKETS)
+            totals = {name: 0 for name, _ in COUNTERS}
+            phases = {phase: 0.0 for phase in PHASES}
+            branching_sum = branching_count = 0.0
+            for series in self._series.values():
+                for i, count in enumerate(series.latency.counts):
+                    latency.counts[i] += count
+                latency.sum += series.latency.sum
+                latency.count += series.latency.count
+                for name, value in series.counters.items():
+                    totals[name] += value
+                for phase, seconds in series.phases.items():
+                    phases[phase] = phases.get(phase, 0.0) + seconds
+                branching_sum += series.branching.sum
+                branching_count += series.branching.count
+        per_query = {name: totals[name] / queries if queries else 0.0
+                     for name, _ in COUNTERS if name not in ("queries", "found")}
+        return {
+            "queries": queries,
+            "found": totals["found"],
+            "latency_mean_ms": latency.mean * 1000,
+            "latency_p50_ms": latency.quantile(0.5) * 1000,
+            "latency_p99_ms": latency.quantile(0.99) * 1000,
+            "per_query": per_query,
+            "branching_factor_mean": branching_sum / branching_count if branching_count else float("nan"),
+            "phase_seconds": phases,
+        }
+
+    # ============= EXPORTACIÓN =============
+
+    def to_prometheus(self) -> str:
+        """Métricas en el formato de texto de Prometheus (para el textfile collector)."""
+        with self._lock:
+            series = sorted(self._series.items())
+            lines: List[str] = []
+            for name, help_text in COUNTERS:
+                metric = f"{METRIC_PREFIX}_{name}_total"
+                lines += [f"# HELP {metric} {help_text}.", f"# TYPE {metric} counter"]
+                for key, s in series:
+                    lines.append(f"{metric}{{{_labels(key)}}} {s.counters[name]}")
+            metric = f"{METRIC_PREFIX}_phase_seconds_total"
+            lines += [f"# HELP {metric} Segundos acumulados por fase de la consulta.",
+                      f"# TYPE {metric} counter"]
+            for key, s in series:
+                for phase, seconds in s.phases.items():
+                    lines.append(f'{metric}{{{_labels(key)},phase="{phase}"}} {_number(seconds)}')
+            for suffix, attr, help_text in (
+                ("query_seconds", "latency", "Duración de cada consulta"),
+                ("expanded_nodes", "expanded", "Nodos expandidos por consulta"),
+                ("branching_factor", "branching", "Factor de ramificación efectivo por consulta"),
+            ):
+                metric = f"{METRIC_PREFIX}_{suffix}"
+                lines += [f"# HELP {metric} {help_text}.", f"# TYPE {metric} histogram"]
+                for key, s in series:
+                    histogram = getattr(s, attr)
+                    labels = _labels(key)
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{metric}_bucket{{{labels},le="{_number(bound)}"}} {total}')
+                    lines.append(f"{metric}_sum{{{labels}}} {_number(histogram.sum)}")
+                    lines.append(f"{metric}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        """Agregados por serie, resumen y consultas recientes en JSON."""
+        with self._lock:
+            series = [{
+                "mode": mode,
+                "heuristic": heuristic,
+                "counters": dict(s.counters),
+                "phase_seconds": dict(s.phases),
+                "latency_seconds": s.latency.as_dict(),
+                "expanded_nodes": s.expanded.as_dict(),
+                "branching_factor": s.branching.as_dict(),
+            } for (mode, heuristic), s in sorted(self._series.items())]
+            recent = [asdict(p) for p in self.recent]
+        document = {"summary": self.summary(), "series": series, "recent": recent}
+        # Los cubos +Inf y los NaN no son JSON estándar: se exportan como null
+        return json.dumps(_json_safe(document), ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        _write_atomic(path, self.to_prometheus())
+
+    def write_json(self, path: str) -> None:
+        _write_atomic(path, self.to_json())
+
+
+def _labels(key: Tuple[str, str]) -> str:
+    mode, heuristic = key
+    return f'mode="{mode}",heuristic="{heuristic}"'
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _json_safe(value):
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def _write_atomic(path: str, text: str) -> None:
+    # Se escribe en un temporal y se renombra, para que un lector (p. ej. el
+    # textfile collector de node_exporter) nunca vea un archivo a medias
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,225 @@
+import os
+import random
+from array import array
+from typing import Callable, List
+
+from array_store import read_arrays, write_arrays
+from compiled_graph import CompiledGraph
+
+# Tabla de landmarks del grafo de Cuenca, guardada junto a graph_data.py
+LANDMARKS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cuenca.landmarks")
+LANDMARK_STRATEGIES = ("farthest", "avoid")
+DEFAULT_LANDMARK_COUNT = 8
+
+INF = float("inf")
+
+
+class LandmarkTable:
+    """
+    Distancias precalculadas desde y hacia un conjunto de landmarks (heurística ALT).
+
+    Por la desigualdad triangular, para cualquier landmark L se cumple
+    ``d(u, v) >= d(L, v) - d(L, u)`` y ``d(u, v) >= d(u, L) - d(v, L)``. El máximo
+    de estas cotas sobre todos los landmarks es una heurística admisible y
+    consistente para A*, mucho más ajustada que la distancia en línea recta.
+    """
+
+    def __init__(self, landmarks: List[int], dist_from: List[array], dist_to: List[array], fingerprint: str):
+        """
+        Args:
+            landmarks: Identificadores de los nodos landmark
+            dist_from: ``dist_from[i][v]`` = d(landmarks[i], v)
+            dist_to: ``dist_to[i][v]`` = d(v, landmarks[i])
+            fingerprint: Huella del grafo para el que se calcularon las distancias
+        """
+        self.landmarks = landmarks
+        self.dist_from = dist_from
+        self.dist_to = dist_to
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, count: int = DEFAULT_LANDMARK_COUNT,
+              strategy: str = "avoid", seed: int = 0) -> "LandmarkTable":
+        """
+        Selecciona landmarks y calcula sus distancias a todos los nodos.
+
+        Args:
+            graph: Grafo compilado
+            count: Número de landmarks (se limita al número de nodos)
+            strategy: ``"farthest"`` (cada landmark lo más lejos posible de los
+                anteriores) o ``"avoid"`` (Goldberg y Werneck: se elige la hoja del
+                subárbol donde la heurística actual es peor)
+            seed: Semilla para la elección de raíces aleatorias
+        """
+        if strategy not in LANDMARK_STRATEGIES:
+            raise ValueError(f"Estrategia de landmarks desconocida: {strategy!r}")
+        table = cls([], [], [], graph.fingerprint())
+        rnd = random.Random(seed)
+        count = min(count, graph.num_nodes)
+        while len(table.landmarks) < count:
+            if strategy == "avoid" and table.landmarks:
+                landmark = table._select_avoid(graph, rnd)
+            else:
+                landmark = table._select_farthest(graph, rnd)
+            if landmark < 0:
+                break
+            table.landmarks.append(landmark)
+            table.dist_from.append(graph.shortest_path_tree(landmark)[0])
+            table.dist_to.append(graph.shortest_path_tree(landmark, reverse=True)[0])
+        return table
+
+    def _select_farthest(self, graph: CompiledGraph, rnd: random.Random) -> int:
+        # Nodo que maximiza la distancia al landmark más cercano. Los nodos que
+        # ningún landmark alcanza se prefieren, así se cubren todas las componentes.
+        chosen = set(self.landmarks)
+        if not self.landmarks:
+            root = rnd.randrange(graph.num_nodes)
+            dist = graph.shortest_path_tree(root)[0]
+            candidates = [v for v in range(graph.num_nodes) if dist[v] < INF]
+            return max(candidates, key=dist.__getitem__)
+
+        best, best_score = -1, -1.0
+        for v in range(graph.num_nodes):
+            if v in chosen:
+                continue
+            score = INF
+            for dist_from, dist_to in zip(self.dist_from, self.dist_to):
+                score = min(score, dist_from[v], dist_to[v])
+            if score > best_score:
+                best, best_score = v, score
+        return best
+
+    def _select_avoid(self, graph: CompiledGraph, rnd: random.Random) -> int:
+        # Árbol de caminos mínimos desde una raíz aleatoria; el peso de cada nodo es
+        # el error de la cota actual. Se desciende siempre por el hijo cuyo
+        # subárbol acumula más error (descartando subárboles con un landmark).
+        root = rnd.randrange(graph.num_nodes)
+        dist, parent, order = graph.shortest_path_tree(root)
+        chosen = set(self.landmarks)
+        size = {v: dist[v] - self.lower_bound(root, v) for v in order}
+        blocked = set()
+        children: dict = {v: [] for v in order}
+        for v in reversed(order):
+            if v in chosen:
+                blocked.add(v)
+            p = parent[v]
+            if p >= 0:
+                children[p].append(v)
+                if v in blocked:
+                    blocked.add(p)
+                else:
+                    size[p] += size[v]
+        for v in blocked:
+            size[v] = 0.0
+
+        node = root
+        while children[node]:
+            child = max(children[node], key=size.__getitem__)
+            if size[child] <= 0.0:
+                break
+            node = child
+        if node in chosen or node == root:
+            return self._select_farthest(graph, rnd)
+        return node
+
+    def matches(self, graph: CompiledGraph) -> bool:
+        return self.fingerprint == graph.fingerprint()
+
+    def admissible(self, graph: CompiledGraph) -> bool:
+        """
+        True si la tabla da cotas válidas en ``graph``: se calculó para él, o para
+        sus pesos originales y desde entonces ningún peso ha bajado. Subir costes o
+        cerrar aristas solo alarga los caminos, así que las cotas siguen siendo
+        admisibles y consistentes sin recalcular la tabla.
+        """
+        if graph.only_raised and self.fingerprint == graph.base_fingerprint:
+            return True
+        return self.matches(graph)
+
+    def lower_bound(self, u: int, v: int) -> float:
+        """Cota inferior de d(u, v) a partir de todos los landmarks."""
+        best = 0.0
+        for dist_from, dist_to in zip(self.dist_from, self.dist_to):
+            # Las diferencias con distancias infinitas (nodos inalcanzables) se descartan
+            bound = dist_from[v] - dist_from[u]
+            if best < bound < INF:
+                best = bound
+            bound = dist_to[u] - dist_to[v]
+            if best < bound < INF:
+                best = bound
+        return best
+
+    def potential_to(self, target: int) -> Callable[[int], float]:
+        """Heurística h(v) = cota inferior de d(v, target)."""
+        terms = [(dist_from, dist_from[target], dist_to, dist_to[target])
+                 for dist_from, dist_to in zip(self.dist_from, self.dist_to)]
+
+        def potential(v: int) -> float:
+            best = 0.0
+            for dist_from, from_target, dist_to, to_target in terms:
+                bound = from_target - dist_from[v]
+                if best < bound < INF:
+                    best = bound
+                bound = dist_to[v] - to_target
+                if best < bound < INF:
+                    best = bound
+            return best
+
+        return potential
+
+    def potential_from(self, source: int) -> Callable[[int], float]:
+        """Heurística h(v) = cota inferior de d(source, v), para la búsqueda inversa."""
+        terms = [(dist_from, dist_from[source], dist_to, dist_to[source])
+                 for dist_from, dist_to in zip(self.dist_from, self.dist_to)]
+
+        def potential(v: int) -> float:
+            best = 0.0
+            for dist_from, from_source, dist_to, to_source in terms:
+                bound = dist_from[v] - from_source
+                if best < bound < INF:
+                    best = bound
+                bound = to_source - dist_to[v]
+                if best < bound < INF:
+                    best = bound
+            return best
+
+        return potential
+
+    def save(self, path: str) -> None:
+        arrays = {"landmarks": array("i", self.landmarks)}
+        for i, (dist_from, dist_to) in enumerate(zip(self.dist_from, self.dist_to)):
+            arrays[f"from_{i}"] = dist_from
+            arrays[f"to_{i}"] = dist_to
+        write_arrays(path, {"kind": "landmarks", "fingerprint": self.fingerprint}, arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "LandmarkTable":
+        meta, arrays = read_arrays(path)
+        if meta.get("kind") != "landmarks":
+            raise ValueError(f"{path} no contiene una tabla de landmarks")
+        landmarks = list(arrays["landmarks"])
+        return cls(
+            landmarks,
+            [arrays[f"from_{i}"] for i in range(len(landmarks))],
+            [arrays[f"to_{i}"] for i in range(len(landmarks))],
+            meta["fingerprint"],
+        )
+
+
+def load_or_build(graph: CompiledGraph, path: str, count: int = DEFAULT_LANDMARK_COUNT,
+                  strategy: str = "avoid") -> LandmarkTable:
+    """
+    Carga la tabla de landmarks de ``path`` si corresponde al grafo; si no, la
+    calcula y la guarda en ``path`` para los siguientes arranques.
+    """
+    if os.path.exists(path):
+        table = LandmarkTable.load(path)
+        if table.matches(graph) and len(table.landmarks) == min(count, graph.num_nodes):
+            return table
+    table = LandmarkTable.build(graph, count=count, strategy=strategy)
+    try:
+        table.save(path)
+    except OSError:
+        # Sin permiso de escritura la tabla se usa igualmente desde memoria
+        pass
+    return table
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from typing import FrozenSet, List, Optional, Sequence, Tuple
+
+from compiled_graph import CompiledGraph
+from instrumentation import QueryProfile
+
+
+@dataclass(frozen=True)
+class SearchStats:
+    """Estadísticas de una consulta."""
+    expanded_forward: int
+    expanded_backward: int = 0
+
+    @property
+    def expanded(self) -> int:
+        return self.expanded_forward + self.expanded_backward
+
+
+@dataclass(frozen=True)
+class RouteResult:
+    """
+    Resultado inmutable de una búsqueda de ruta.
+
+    Cada consulta devuelve su propio resultado en lugar de guardar el estado en el
+    buscador, así que una misma instancia puede atender varias sesiones o hilos.
+    ``profile`` solo está presente si el buscador tiene un perfilador activo y no
+    interviene al comparar resultados.
+
+    ``origin`` indica de dónde sale el resultado: ``"search"`` (búsqueda con el
+    modo y la heurística pedidos), ``"table"`` (tabla de distancias precalculada,
+    sin nodos explorados) o ``"tree"`` (árbol de caminos mínimos de la caché de
+    rutas: los explorados son los nodos que Dijkstra asentó antes del destino,
+    todos hacia adelante, y no hay perfil).
+
+    ``legs`` es la distancia en km de cada tramo de ``path``, tomada de la propia
+    consulta: un cambio posterior de pesos no altera el desglose.
+    """
+    path: Optional[Tuple[str, ...]]
+    cost: float
+    explored: FrozenSet[str]
+    stats: SearchStats
+    profile: Optional[QueryProfile] = field(default=None, compare=False)
+    origin: str = field(default="search", compare=False)
+    legs: Optional[Tuple[float, ...]] = field(default=None, compare=False)
+
+    @property
+    def found(self) -> bool:
+        return self.path is not None
+
+    @property
+    def visited_nodes(self) -> int:
+        return self.stats.expanded
+
+
+def make_result(graph: CompiledGraph, path: Optional[List[int]], cost: float,
+                forward: List[int], backward: List[int], origin: str = "search",
+                arrivals: Optional[Sequence[float]] = None) -> RouteResult:
+    """
+    Convierte el resultado de un núcleo de búsqueda (identificadores) a nombres.
+
+    ``arrivals`` es la distancia acumulada (g) en cada nodo de ``path``; los tramos
+    salen de sus diferencias. Sin ella (atajos desempaquetados, desvíos de Yen) se
+    usan los pesos del grafo en el momento de la consulta.
+    """
+    names = graph.names
+    return RouteResult(
+        path=tuple(names[i] for i in path) if path is not None else None,
+        cost=cost,
+        explored=frozenset(names[i] for i in forward + backward),
+        stats=SearchStats(len(forward), len(backward)),
+        origin=origin,
+        legs=leg_costs(graph, path, arrivals) if path is not None else None,
+    )
+
+
+def leg_costs(graph: CompiledGraph, path: List[int],
+              arrivals: Optional[Sequence[float]] = None) -> Tuple[float, ...]:
+    """Distancia de cada tramo de ``path``, a partir de ``arrivals`` o de los pesos del grafo."""
+    if arrivals is not None:
+        return tuple(b - a for a, b in zip(arrivals, arrivals[1:]))
+    return tuple(graph.edge_cost(u, v) for u, v in zip(path, path[1:]))
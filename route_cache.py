@@ -0,0 +1,208 @@
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+from results import RouteResult, SearchStats, leg_costs
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Consultas distintas desde un mismo origen antes de calcular su árbol completo
+DEFAULT_TREE_THRESHOLD = 3
+# Bytes por nodo de un ShortestPathTree (distancias, padres, orden y posiciones);
+# medido entre 50 y 61 según el tamaño del diccionario, se usa la cota alta
+TREE_BYTES_PER_NODE = 61
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    tree_hits: int
+    evictions: int
+    invalidations: int
+    entries: int
+    bytes: int
+
+
+class RouteCache:
+    """
+    Caché LRU acotada por número de entradas y por bytes (estimados).
+
+    Cada entrada se guarda junto con la versión del grafo; cuando la versión
+    cambia, la caché se vacía entera en el siguiente acceso.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.tree_hits = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, version: int, size: int) -> None:
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def record(self, counter: str) -> None:
+        """Incrementa un contador (``hits``, ``misses`` o ``tree_hits``)."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.tree_hits, self.evictions,
+                              self.invalidations, len(self._entries), self._bytes)
+
+
+class ShortestPathTree:
+    """Árbol de caminos mínimos completo desde un origen: responde a cualquier destino."""
+
+    def __init__(self, graph, source: int):
+        self.graph = graph
+        self.source = source
+        self.dist, self.parent, self.order = graph.shortest_path_tree(source)
+        self.position = {v: i for i, v in enumerate(self.order)}
+
+    @property
+    def nbytes(self) -> int:
+        return (memoryview(self.dist).nbytes + memoryview(self.parent).nbytes
+                + sys.getsizeof(self.order) + sys.getsizeof(self.position))
+
+    def route(self, goal: int) -> RouteResult:
+        """Ruta al destino; los nodos explorados son los que Dijkstra asentó antes de él."""
+        names = self.graph.names
+        if goal not in self.position:
+            explored = self.order
+            return RouteResult(None, float("inf"), frozenset(names[v] for v in explored),
+                               SearchStats(len(explored)), origin="tree")
+        explored = self.order[:self.position[goal] + 1]
+        path = [goal]
+        while self.parent[path[-1]] >= 0:
+            path.append(self.parent[path[-1]])
+        path.reverse()
+        return RouteResult(tuple(names[v] for v in path), self.dist[goal],
+                           frozenset(names[v] for v in explored), SearchStats(len(explored)),
+                           origin="tree", legs=leg_costs(self.graph, path, [self.dist[v] for v in path]))
+
+
+def _result_size(result: RouteResult) -> int:
+    # Estimación: contenedores propios del resultado (los nombres son del grafo)
+    return sys.getsizeof(result) + sys.getsizeof(result.path) + sys.getsizeof(result.explored) + 64
+
+
+class CachedPathFinder:
+    """
+    Caché de rutas delante de un ``AStarPathFinder``.
+
+    Las rutas se guardan por (inicio, destino, modo, heurística). Cuando un mismo
+    origen se consulta con ``tree_threshold`` destinos distintos, se calcula su
+    árbol de caminos mínimos completo y se guarda también, de modo que cualquier
+    destino posterior desde ese origen se responde sin buscar. El árbol no se
+    calcula si su tamaño estimado no cabe en la caché, y tras calcularlo el
+    contador del origen vuelve a cero: si la caché lo desaloja, hacen falta otros
+    ``tree_threshold`` fallos antes de recalcularlo.
+
+    Las respuestas del árbol llevan ``origin == "tree"``: la ruta y el costo son
+    los óptimos, pero los nodos explorados y las estadísticas son los del Dijkstra
+    del árbol, no los del modo y la heurística pedidos, y no tienen perfil.
+    """
+
+    def __init__(self, pathfinder, cache: Optional[RouteCache] = None,
+                 tree_threshold: int = DEFAULT_TREE_THRESHOLD):
+        self.pathfinder = pathfinder
+        self.cache = cache if cache is not None else RouteCache()
+        self.tree_threshold = tree_threshold
+        self._source_misses: "OrderedDict[int, int]" = OrderedDict()
+        self._misses_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def find_path(self, start, goal, mode: str = "unidirectional",
+                  heuristic: str = "euclidean") -> RouteResult:
+        # Una consulta inválida falla aunque la respuesta pudiera salir de la caché
+        self.pathfinder.validate(mode, heuristic)
+        # Las coordenadas se ajustan a su nodo antes de buscar en la caché, así que
+        # puntos distintos que caen en el mismo nodo comparten entrada
+        start, goal = self.pathfinder.snap(start), self.pathfinder.snap(goal)
+        graph = self.pathfinder.graph
+        version = graph.version
+        cache = self.cache
+        key = (start, goal, mode, heuristic)
+        result = cache.get(key, version)
+        if result is not None:
+            cache.record("hits")
+            return result
+
+        source = graph.id_of(start)
+        tree = cache.get(("tree", source), version)
+        if tree is not None:
+            cache.record("tree_hits")
+            result = tree.route(graph.id_of(goal))
+        else:
+            cache.record("misses")
+            result = self.pathfinder.find_path(start, goal, mode, heuristic)
+            if (self._tree_due(source, version)
+                    and graph.num_nodes * TREE_BYTES_PER_NODE <= cache.max_bytes):
+                tree = ShortestPathTree(graph, source)
+                cache.put(("tree", source), tree, version, tree.nbytes)
+        cache.put(key, result, version, _result_size(result))
+        return result
+
+    def _tree_due(self, source: int, version: int) -> bool:
+        # Cuenta un fallo desde ``source``; al llegar al umbral el contador se reinicia,
+        # así que un árbol descartado o desalojado no se recalcula en cada fallo
+        with self._lock:
+            if version != self._misses_version:
+                self._source_misses.clear()
+                self._misses_version = version
+            count = self._source_misses.pop(source, 0) + 1
+            if count >= self.tree_threshold:
+                return True
+            self._source_misses[source] = count
+            # Los contadores por origen se acotan igual que la caché (LRU)
+            while len(self._source_misses) > self.cache.max_entries:
+                self._source_misses.popitem(last=False)
+            return False
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
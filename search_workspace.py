@@ -0,0 +1,151 @@
+from array import array
+from typing import List, Tuple
+
+
+class IndexedMinHeap:
+    """
+    Cola de prioridad binaria indexada por nodo (enteros 0..capacity-1).
+
+    Cada nodo aparece como máximo una vez: ``push`` inserta o, si el nodo ya está
+    en la cola con una prioridad peor, aplica decrease-key. Así no se acumulan
+    entradas obsoletas como ocurre con ``heapq`` y las inserciones duplicadas.
+
+    ``pushes`` y ``pops`` cuentan las operaciones efectivas desde que se creó la
+    cola (``clear`` no los reinicia), para medir el trabajo de cada consulta;
+    ``decreases`` cuenta los decrease-key incluidos en ``pushes``, es decir, las
+    entradas obsoletas que dejaría ``heapq`` con inserciones duplicadas.
+    """
+
+    def __init__(self, capacity: int):
+        self.keys: List[float] = []
+        self.items: List[int] = []
+        self.pos = array("i", [-1]) * capacity  # posición de cada nodo en el heap, -1 si no está
+        self.pushes = 0
+        self.pops = 0
+        self.decreases = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def __contains__(self, item: int) -> bool:
+        return self.pos[item] >= 0
+
+    def clear(self) -> None:
+        pos = self.pos
+        for item in self.items:
+            pos[item] = -1
+        self.keys.clear()
+        self.items.clear()
+
+    def peek_key(self) -> float:
+        return self.keys[0]
+
+    def push(self, item: int, key: float) -> bool:
+        """
+        Inserta ``item`` o reduce su prioridad.
+
+        Returns:
+            True si la cola cambió (inserción o decrease-key), False si ya tenía
+            una prioridad igual o mejor
+        """
+        i = self.pos[item]
+        if i < 0:
+            i = len(self.items)
+            self.keys.append(key)
+            self.items.append(item)
+        elif key < self.keys[i]:
+            self.keys[i] = key
+            self.decreases += 1
+        else:
+            return False
+        self.pushes += 1
+        self._sift_up(i, item, key)
+        return True
+
+    def pop(self) -> Tuple[float, int]:
+        keys, items, pos = self.keys, self.items, self.pos
+        self.pops += 1
+        top_key, top_item = keys[0], items[0]
+        pos[top_item] = -1
+        last_key, last_item = keys.pop(), items.pop()
+        if items:
+            self._sift_down(0, last_item, last_key)
+        return top_key, top_item
+
+    def _sift_up(self, i: int, item: int, key: float) -> None:
+        keys, items, pos = self.keys, self.items, self.pos
+        while i > 0:
+            parent = (i - 1) >> 1
+            parent_key = keys[parent]
+            if not key < parent_key:
+                break
+            keys[i] = parent_key
+            parent_item = items[parent]
+            items[i] = parent_item
+            pos[parent_item] = i
+            i = parent
+        keys[i] = key
+        items[i] = item
+        pos[item] = i
+
+    def _sift_down(self, i: int, item: int, key: float) -> None:
+        keys, items, pos = self.keys, self.items, self.pos
+        n = len(items)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            right = child + 1
+            if right < n and keys[right] < keys[child]:
+                child = right
+            child_key = keys[child]
+            if not child_key < key:
+                break
+            keys[i] = child_key
+            child_item = items[child]
+            items[i] = child_item
+            pos[child_item] = i
+            i = child
+        keys[i] = key
+        items[i] = item
+        pos[item] = i
+
+
+class SearchWorkspace:
+    """
+    Memoria de trabajo preasignada para una búsqueda sobre un grafo de ``size`` nodos.
+
+    En lugar de crear ``visited``/``explored`` en cada consulta, los arreglos se
+    reutilizan y se "vacían" incrementando un contador de generación: un nodo
+    solo tiene valores válidos en ``g``/``parent``/``h`` si ``stamp[v]`` coincide
+    con la generación actual, y está cerrado si ``closed[v]`` coincide con ella.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.generation = 0
+        self.stamp = array("q", [0]) * size
+        self.closed = array("q", [0]) * size
+        self.g = array("d", [0.0]) * size
+        self.h = array("d", [0.0]) * size
+        self.parent = array("i", [-1]) * size
+        self.heap = IndexedMinHeap(size)
+
+    def begin(self) -> int:
+        """Prepara el espacio para una nueva consulta y devuelve su generación."""
+        self.generation += 1
+        self.heap.clear()
+        return self.generation
+
+    def path_to(self, node: int) -> List[int]:
+        """Reconstruye el camino hasta ``node`` siguiendo los punteros a predecesor."""
+        parent = self.parent
+        path = [node]
+        while parent[node] >= 0:
+            node = parent[node]
+            path.append(node)
+        path.reverse()
+        return path
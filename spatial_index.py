@@ -0,0 +1,132 @@
+import heapq
+import math
+from array import array
+from typing import List, Sequence, Tuple
+
+from graph_data import haversine_distance
+
+# Nodos por celda buscados al elegir el tamaño de la rejilla
+NODES_PER_CELL = 2
+# Kilómetros por grado de latitud con el radio terrestre de haversine_distance
+KM_PER_DEGREE = 6371.0 * math.pi / 180.0
+
+
+class SpatialIndex:
+    """
+    Rejilla uniforme sobre las coordenadas de los nodos.
+
+    Cada celda guarda los identificadores de sus nodos en formato CSR (igual que
+    las aristas de ``CompiledGraph``): los nodos de la celda ``c`` ocupan
+    ``cell_nodes[cell_offsets[c]:cell_offsets[c + 1]]``. El tamaño de celda se
+    elige para que haya unos pocos nodos por celda, así que una consulta solo
+    revisa las celdas cercanas al punto y no recorre todos los nodos.
+    """
+
+    def __init__(self, lat: Sequence[float], lon: Sequence[float]):
+        """
+        Args:
+            lat, lon: Coordenadas de cada nodo, en orden de identificador
+        """
+        n = len(lat)
+        if n == 0:
+            raise ValueError("No se puede indexar un grafo sin nodos")
+        self.lat = lat
+        self.lon = lon
+        self.min_lat, self.max_lat = min(lat), max(lat)
+        self.min_lon, self.max_lon = min(lon), max(lon)
+        # Para que las cotas sean válidas en toda la rejilla se usa el coseno más
+        # pequeño (la latitud más alejada del ecuador)
+        max_abs_lat = max(abs(self.min_lat), abs(self.max_lat))
+        self.km_per_lon = KM_PER_DEGREE * max(math.cos(math.radians(max_abs_lat)), 1e-6)
+
+        height = (self.max_lat - self.min_lat) * KM_PER_DEGREE
+        width = (self.max_lon - self.min_lon) * self.km_per_lon
+        cells = max(1, n // NODES_PER_CELL)
+        self.cell_km = max(math.sqrt(height * width / cells), max(height, width) / cells, 1e-3)
+        self.rows = int(height / self.cell_km) + 1
+        self.cols = int(width / self.cell_km) + 1
+
+        # Ordenación por conteo de los nodos según su celda
+        cell_of = [self._cell(lat[i], lon[i]) for i in range(n)]
+        counts = [0] * (self.rows * self.cols + 1)
+        for c in cell_of:
+            counts[c + 1] += 1
+        for c in range(len(counts) - 1):
+            counts[c + 1] += counts[c]
+        self.cell_offsets = array("q", counts)
+        fill = counts[:-1]
+        cell_nodes = array("i", [0]) * n
+        for i, c in enumerate(cell_of):
+            cell_nodes[fill[c]] = i
+            fill[c] += 1
+        self.cell_nodes = cell_nodes
+
+    def _coords(self, lat: float, lon: float) -> Tuple[float, float]:
+        # Posición del punto en unidades de celda (puede caer fuera de la rejilla)
+        return ((lat - self.min_lat) * KM_PER_DEGREE / self.cell_km,
+                (lon - self.min_lon) * self.km_per_lon / self.cell_km)
+
+    def _cell(self, lat: float, lon: float) -> int:
+        y, x = self._coords(lat, lon)
+        return min(int(y), self.rows - 1) * self.cols + min(int(x), self.cols - 1)
+
+    def _scan(self, rows: range, cols: range, lat: float, lon: float, out: List[Tuple[float, int]]) -> None:
+        # Añade a ``out`` los nodos de las celdas indicadas (recortadas a la rejilla)
+        node_lat, node_lon, cell_nodes, offsets = self.lat, self.lon, self.cell_nodes, self.cell_offsets
+        for r in range(max(rows.start, 0), min(rows.stop, self.rows)):
+            for c in range(max(cols.start, 0), min(cols.stop, self.cols)):
+                cell = r * self.cols + c
+                for k in range(offsets[cell], offsets[cell + 1]):
+                    i = cell_nodes[k]
+                    out.append((haversine_distance(lat, lon, node_lat[i], node_lon[i]), i))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[int, float]]:
+        """
+        Los ``k`` nodos más cercanos al punto.
+
+        Se revisan anillos de celdas alrededor del punto hasta que la distancia
+        mínima posible al siguiente anillo supera la del k-ésimo candidato.
+
+        Returns:
+            Pares (identificador, distancia en km) ordenados por distancia
+        """
+        if k <= 0:
+            return []
+        y, x = self._coords(lat, lon)
+        row, col = math.floor(y), math.floor(x)
+        # Distancia (en celdas) desde el punto al borde de su celda
+        margin = min(y - row, row + 1 - y, x - col, col + 1 - x)
+        # Primer y último anillo que contienen celdas de la rejilla
+        first = max(0, -row, row - self.rows + 1, -col, col - self.cols + 1)
+        last = max(abs(row), abs(row - self.rows + 1), abs(col), abs(col - self.cols + 1))
+        k = min(k, len(self.lat))
+        candidates: List[Tuple[float, int]] = []
+        for ring in range(first, last + 1):
+            if len(candidates) >= k:
+                kth = heapq.nsmallest(k, candidates)[-1][0]
+                if (ring - 1 + margin) * self.cell_km > kth:
+                    break
+            if ring == 0:
+                self._scan(range(row, row + 1), range(col, col + 1), lat, lon, candidates)
+                continue
+            columns = range(col - ring, col + ring + 1)
+            self._scan(range(row - ring, row - ring + 1), columns, lat, lon, candidates)
+            self._scan(range(row + ring, row + ring + 1), columns, lat, lon, candidates)
+            inner = range(row - ring + 1, row + ring)
+            self._scan(inner, range(col - ring, col - ring + 1), lat, lon, candidates)
+            self._scan(inner, range(col + ring, col + ring + 1), lat, lon, candidates)
+        return [(i, d) for d, i in heapq.nsmallest(k, candidates)]
+
+    def within_radius(self, lat: float, lon: float, km: float) -> List[Tuple[int, float]]:
+        """
+        Nodos a ``km`` kilómetros o menos del punto.
+
+        Returns:
+            Pares (identificador, distancia en km) ordenados por distancia
+        """
+        y, x = self._coords(lat, lon)
+        span = km / self.cell_km
+        candidates: List[Tuple[float, int]] = []
+        self._scan(range(math.floor(y - span), math.floor(y + span) + 1),
+                   range(math.floor(x - span), math.floor(x + span) + 1), lat, lon, candidates)
+        return [(i, d) for d, i in sorted(candidates) if d <= km]
@@ -0,0 +1,291 @@
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from graph_data import WALKING_MINUTES_PER_KM
+
+# Hasta este número de paradas libres se usa Held–Karp (exacto); con más, búsqueda local
+HELD_KARP_LIMIT = 12
+# Tiempo máximo (segundos) de la búsqueda local
+DEFAULT_TIME_LIMIT = 1.0
+
+INF = float("inf")
+
+
+@dataclass(frozen=True)
+class TourResult:
+    """
+    Recorrido por varios puntos de interés.
+
+    ``stops`` son las paradas en orden de visita (incluidos el inicio y el final
+    fijos, si los hay), ``legs`` la distancia en km de cada tramo entre paradas y
+    ``path`` la ruta completa nodo a nodo. Las paradas que no caben en el
+    presupuesto de tiempo quedan en ``skipped``; si ni siquiera el trayecto entre
+    el inicio y el final fijos cabe, ``within_budget`` es False.
+    """
+    stops: Tuple[str, ...]
+    legs: Tuple[float, ...]
+    path: Optional[Tuple[str, ...]]
+    distance: float
+    walking_minutes: float
+    visit_minutes: int
+    skipped: Tuple[str, ...]
+    exact: bool
+    within_budget: bool = True
+
+    @property
+    def found(self) -> bool:
+        return self.path is not None
+
+    @property
+    def total_minutes(self) -> float:
+        return self.walking_minutes + self.visit_minutes
+
+
+class TourPlanner:
+    """
+    Ordena las visitas a un conjunto de puntos de interés minimizando la distancia
+    a pie.
+
+    La matriz de costes se obtiene con una sola llamada a ``many_to_many`` del
+    buscador. Con pocas paradas el orden es óptimo (programación dinámica de
+    Held–Karp sobre subconjuntos); con más se parte del vecino más cercano y se
+    mejora con 2-opt y Or-opt hasta converger o agotar ``time_limit``.
+    """
+
+    def __init__(self, pathfinder, time_limit: float = DEFAULT_TIME_LIMIT,
+                 exact_limit: int = HELD_KARP_LIMIT):
+        self.pathfinder = pathfinder
+        self.time_limit = time_limit
+        self.exact_limit = exact_limit
+
+    def plan(self, pois: Sequence, start=None, end=None,
+             time_budget: Optional[float] = None) -> TourResult:
+        """
+        Planifica el recorrido.
+
+        Args:
+            pois: Puntos de interés a visitar (nombres o coordenadas (lat, lon))
+            start: Punto de partida fijo; None deja que el recorrido empiece en
+                cualquier parada
+            end: Punto de llegada fijo (igual a ``start`` para volver al inicio);
+                None deja el final libre
+            time_budget: Minutos disponibles (a pie + visitas); si el recorrido no
+                cabe se descartan paradas
+
+        Returns:
+            TourResult con el orden, la ruta completa, la distancia en km y los
+            tiempos en minutos
+        """
+        finder = self.pathfinder
+        start = finder.snap(start) if start is not None else None
+        end = finder.snap(end) if end is not None else None
+        pois = list(dict.fromkeys(finder.snap(p) for p in pois))
+        free = [p for p in pois if p not in (start, end)]
+        fixed = [p for p in dict.fromkeys((start, end)) if p is not None]
+
+        points = fixed + free
+        costs, routes = finder.many_to_many(points, points, return_paths=True)
+        # Índices en la matriz; None representa un extremo libre (coste 0)
+        s = points.index(start) if start is not None else None
+        e = points.index(end) if end is not None else None
+        first = len(fixed)
+        dist = costs.tolist()
+        visit = [finder.nodes[p].get("tiempo", 0) if p in pois else 0 for p in points]
+        budget = time_budget if time_budget is not None else INF
+
+        if len(free) <= self.exact_limit:
+            order = _held_karp(dist, visit, s, e, list(range(first, len(points))), budget)
+            exact = True
+        else:
+            deadline = time.perf_counter() + self.time_limit
+            order = _local_search(dist, s, e, list(range(first, len(points))), deadline)
+            order = _fit_budget(dist, visit, s, e, order, budget, deadline)
+            exact = False
+
+        sequence = ([s] if s is not None else []) + order + ([e] if e is not None else [])
+        legs = tuple(dist[a][b] for a, b in zip(sequence, sequence[1:]))
+        distance = sum(legs)
+        path: Optional[List[str]] = None
+        if distance < INF:
+            path = [points[sequence[0]]] if sequence else []
+            for a, b in zip(sequence, sequence[1:]):
+                path.extend(routes[a][b][1:])
+        visited = set(sequence)
+        # Sin paradas libres que descartar, el inicio y el final fijos pueden no caber
+        within_budget = _path_minutes(dist, visit, s, e, order) <= budget
+        return TourResult(
+            stops=tuple(points[i] for i in sequence),
+            legs=legs,
+            path=tuple(path) if path is not None else None,
+            distance=distance,
+            walking_minutes=distance * WALKING_MINUTES_PER_KM,
+            visit_minutes=sum(visit[i] for i in visited),
+            skipped=tuple(points[i] for i in range(first, len(points)) if i not in visited),
+            exact=exact,
+            within_budget=within_budget,
+        )
+
+
+def _path_minutes(dist: List[List[float]], visit: List[int], s: Optional[int],
+                  e: Optional[int], order: List[int]) -> float:
+    # Minutos totales (a pie + visitas) de inicio -> order -> final
+    sequence = ([s] if s is not None else []) + order + ([e] if e is not None else [])
+    walked = sum(dist[a][b] for a, b in zip(sequence, sequence[1:]))
+    return walked * WALKING_MINUTES_PER_KM + sum(visit[i] for i in set(sequence))
+
+
+def _held_karp(dist: List[List[float]], visit: List[int], s: Optional[int], e: Optional[int],
+               free: List[int], budget: float) -> List[int]:
+    """
+    Programación dinámica sobre subconjuntos: ``best[mask][j]`` es la distancia
+    mínima desde el inicio visitando exactamente las paradas de ``mask`` y
+    terminando en la parada ``j``. Con presupuesto se elige el subconjunto más
+    grande que cabe (y, entre los de igual tamaño, el más corto).
+    """
+    m = len(free)
+    full = 1 << m
+    best = [[INF] * m for _ in range(full)]
+    parent = [[-1] * m for _ in range(full)]
+    for j in range(m):
+        best[1 << j][j] = dist[s][free[j]] if s is not None else 0.0
+    for mask in range(1, full):
+        row = best[mask]
+        for j in range(m):
+            cost = row[j]
+            if cost == INF:
+                continue
+            dj = dist[free[j]]
+            for k in range(m):
+                if mask & (1 << k):
+                    continue
+                candidate = cost + dj[free[k]]
+                nxt = mask | (1 << k)
+                if candidate < best[nxt][k]:
+                    best[nxt][k] = candidate
+                    parent[nxt][k] = j
+
+    fixed_visit = sum(visit[i] for i in {s, e} if i is not None)
+    closing = dist[s][e] if s is not None and e is not None else 0.0
+    chosen: Tuple[int, float, int, int] = (0, closing, 0, -1)  # (paradas, km, máscara, última)
+    if closing * WALKING_MINUTES_PER_KM + fixed_visit > budget:
+        chosen = (0, INF, 0, -1)
+    for mask in range(1, full):
+        count = bin(mask).count("1")
+        visit_minutes = fixed_visit + sum(visit[free[j]] for j in range(m) if mask & (1 << j))
+        for j in range(m):
+            cost = best[mask][j]
+            if cost == INF:
+                continue
+            total = cost + (dist[free[j]][e] if e is not None else 0.0)
+            if total == INF or total * WALKING_MINUTES_PER_KM + visit_minutes > budget:
+                continue
+            if count > chosen[0] or (count == chosen[0] and total < chosen[1]):
+                chosen = (count, total, mask, j)
+
+    order: List[int] = []
+    _, _, mask, j = chosen
+    while j >= 0:
+        order.append(free[j])
+        mask, j = mask & ~(1 << j), parent[mask][j]
+    order.reverse()
+    return order
+
+
+def _local_search(dist: List[List[float]], s: Optional[int], e: Optional[int],
+                  free: List[int], deadline: float, initial: bool = False) -> List[int]:
+    """
+    Vecino más cercano seguido de 2-opt y Or-opt hasta no mejorar o agotar el
+    tiempo. Con ``initial=True`` se mejora ``free`` en el orden dado.
+    """
+    # Nodo ficticio a distancia 0 de todo para los extremos libres
+    dummy = len(dist)
+    matrix = [row + [0.0] for row in dist] + [[0.0] * (dummy + 1)]
+    head = s if s is not None else dummy
+    tail = e if e is not None else dummy
+
+    order: List[int] = list(free) if initial else []
+    remaining = set() if initial else set(free)
+    current = head
+    while remaining:
+        row = matrix[current]
+        current = min(remaining, key=row.__getitem__)
+        order.append(current)
+        remaining.remove(current)
+
+    route = [head] + order + [tail]
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = _two_opt(matrix, route, deadline) | _or_opt(matrix, route, deadline)
+    return route[1:-1]
+
+
+def _two_opt(matrix: List[List[float]], route: List[int], deadline: float) -> bool:
+    # Invierte tramos route[i..j]; como el grafo es dirigido, el coste del tramo
+    # invertido se obtiene con sumas acumuladas de ambos sentidos
+    improved = False
+    n = len(route)
+    restart = True
+    while restart and time.perf_counter() < deadline:
+        restart = False
+        forward = [0.0] * n
+        backward = [0.0] * n
+        for k in range(1, n):
+            forward[k] = forward[k - 1] + matrix[route[k - 1]][route[k]]
+            backward[k] = backward[k - 1] + matrix[route[k]][route[k - 1]]
+        for i in range(1, n - 2):
+            a = route[i - 1]
+            for j in range(i + 1, n - 1):
+                b, c, d = route[i], route[j], route[j + 1]
+                old = matrix[a][b] + (forward[j] - forward[i]) + matrix[c][d]
+                new = matrix[a][c] + (backward[j] - backward[i]) + matrix[b][d]
+                if new < old - 1e-12:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    improved = restart = True
+                    break
+            if restart:
+                break
+    return improved
+
+
+def _or_opt(matrix: List[List[float]], route: List[int], deadline: float) -> bool:
+    # Mueve tramos de 1 a 3 paradas consecutivas a otra posición del recorrido
+    improved = False
+    restart = True
+    while restart and time.perf_counter() < deadline:
+        restart = False
+        n = len(route)
+        for length in (1, 2, 3):
+            for i in range(1, n - length):
+                j = i + length - 1
+                a, b, c, d = route[i - 1], route[i], route[j], route[j + 1]
+                removed = matrix[a][b] + matrix[c][d] - matrix[a][d]
+                for k in range(0, n - 1):
+                    if i - 1 <= k <= j:
+                        continue
+                    p, q = route[k], route[k + 1]
+                    if matrix[p][b] + matrix[c][q] - matrix[p][q] < removed - 1e-12:
+                        segment = route[i:j + 1]
+                        del route[i:j + 1]
+                        at = k + 1 if k < i else k + 1 - length
+                        route[at:at] = segment
+                        improved = restart = True
+                        break
+                if restart:
+                    break
+            if restart:
+                break
+    return improved
+
+
+def _fit_budget(dist: List[List[float]], visit: List[int], s: Optional[int], e: Optional[int],
+                order: List[int], budget: float, deadline: float) -> List[int]:
+    """Descarta la parada que más minutos ahorra hasta que el recorrido cabe en el presupuesto."""
+    order = list(order)
+    while order and _path_minutes(dist, visit, s, e, order) > budget:
+        drop = min(range(len(order)),
+                   key=lambda i: _path_minutes(dist, visit, s, e, order[:i] + order[i + 1:]))
+        del order[drop]
+        if time.perf_counter() < deadline:
+            order = _local_search(dist, s, e, order, deadline, initial=True)
+    return order